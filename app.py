@@ -1,62 +1,276 @@
 import os
+import time
+import threading
 from datetime import datetime
 from functools import wraps
-from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify
-from dotenv import load_dotenv
-from models import db, Post, Work, Roadmap, Stage, Task
-
-load_dotenv()
-
-app = Flask(__name__)
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///blog.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-secret-change-me')
-
-db.init_app(app)
-
-with app.app_context():
-    db.create_all()
+from collections import namedtuple
+import click
+from flask import (Blueprint, Flask, Response, current_app, render_template, request, redirect, url_for, session,
+                   flash, jsonify, abort, stream_with_context)
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import load_only, undefer
+from models import (db, Post, Work, Roadmap, Stage, Task, Tag, post_tag, parse_tags, prune_tags, read_only,
+                    setup_sqlite, sqlite_int)
+from progress import (percent, bump_counters, bump_roadmap_counters, toggle_task, rebuild_counters,
+                      set_tasks_done, delete_tasks, MAX_BATCH, latest_event_id, events_since)
+import search
+from content import RENDERER_VERSION
+from migrations import run_migrations, current_version, explain_hot_queries, migrate_tags, render_posts, MIGRATIONS
+from cache import page_cache
+from instrumentation import instrumentation
+import export
+import transfer
+from assets import assets, build_assets
+import images
+from config import CONFIGS
+
+def create_app(config_name=None):
+    """Tạo app theo profile APP_CONFIG (development | production)."""
+    config_name = config_name or os.getenv('APP_CONFIG', 'development')
+    app = Flask(__name__)
+    app.config.from_object(CONFIGS[config_name])
+
+    db.init_app(app)
+    page_cache.init_app(app, db)
+    assets.init_app(app)
+    app.add_template_filter(parse_tags, 'split_tags')
+    app.register_blueprint(bp)
+
+    with app.app_context():
+        setup_sqlite(app)
+        instrumentation.init_app(app, db)
+        run_migrations(log=app.logger.info)
+        # không để connection mở lọt qua fork của gunicorn (preload_app)
+        db.engine.dispose()
+    return app
+
+# route và lệnh CLI khai báo trên blueprint bên dưới; create_app gắn vào từng app.
+# cli_group=None: lệnh nằm thẳng dưới `flask`, không thêm tiền tố
+bp = Blueprint('main', __name__, cli_group=None)
+
+# ---------------- Pagination ----------------
+Page = namedtuple('Page', 'items next_before prev_after')
+
+# cột mà các trang danh sách thực sự hiển thị; Post.content chỉ post_detail mới tải
+POST_LIST_COLUMNS = (Post.id, Post.title, Post.date, Post.tags, Post.desc, Post.excerpt)
+
+def keyset_page(query, column, per_page):
+    """Phân trang theo cursor trên `column` (mới nhất trước).
+
+    `?before=<id>` lấy trang cũ hơn, `?after=<id>` quay lại trang mới hơn.
+    Lấy thừa một dòng để biết còn trang tiếp theo hay không, không cần COUNT.
+    Cursor ngoài phạm vi INTEGER của SQLite coi như không có.
+    """
+    before = sqlite_int(request.args.get('before', type=int))
+    after = sqlite_int(request.args.get('after', type=int))
+    if after is not None:
+        rows = query.filter(column > after).order_by(column.asc()).limit(per_page + 1).all()
+        has_newer = len(rows) > per_page
+        items = rows[:per_page][::-1]
+        has_older = bool(items)
+    else:
+        if before is not None:
+            query = query.filter(column < before)
+        rows = query.order_by(column.desc()).limit(per_page + 1).all()
+        has_older = len(rows) > per_page
+        items = rows[:per_page]
+        has_newer = before is not None and bool(items)
+    return Page(
+        items=items,
+        next_before=items[-1].id if has_older else None,
+        prev_after=items[0].id if has_newer else None,
+    )
 
 # ---------------- Public Routes ----------------
-@app.route('/')
+@bp.route('/')
+@page_cache.cached
+@read_only
 def home():
-    posts = Post.query.order_by(Post.id.desc()).limit(3).all()
+    posts = Post.query.options(load_only(*POST_LIST_COLUMNS)).order_by(Post.id.desc()).limit(3).all()
     works = Work.query.order_by(Work.id.desc()).limit(3).all()
     return render_template('index.html', posts=posts, works=works)
 
-@app.route('/blog')
+@bp.route('/blog')
+@page_cache.cached
+@read_only
 def blog():
-    posts = Post.query.order_by(Post.id.desc()).all()
-    return render_template('blog.html', posts=posts)
+    page = keyset_page(Post.query.options(load_only(*POST_LIST_COLUMNS)), Post.id, current_app.config['PAGE_SIZE'])
+    return render_template('Blog.html', posts=page.items, page=page)
 
-@app.route('/post/<int:post_id>')
+@bp.route('/post/<int:post_id>')
+@page_cache.cached
+@read_only
 def post_detail(post_id):
-    post = Post.query.get_or_404(post_id)
+    # chỉ phục vụ HTML đã render lúc lưu, không đọc Markdown gốc
+    post = Post.query.options(undefer(Post.content_html), undefer(Post.content_toc)).get_or_404(post_id)
     return render_template('post.html', post=post)
 
-@app.route('/works')
+@bp.route('/tag/<path:name>')
+@page_cache.cached
+@read_only
+def tag_posts(name):
+    tag = Tag.query.filter_by(name=name.lower()).first_or_404()
+    query = (Post.query.options(load_only(*POST_LIST_COLUMNS))
+             .join(post_tag, post_tag.c.post_id == Post.id)
+             .filter(post_tag.c.tag_id == tag.id))
+    # sắp theo post_tag.post_id để đi thẳng theo index (tag_id, post_id), không cần sort tạm
+    page = keyset_page(query, post_tag.c.post_id, current_app.config['PAGE_SIZE'])
+    return render_template('Blog.html', posts=page.items, page=page, tag=tag)
+
+@bp.route('/tags')
+@page_cache.cached
+@read_only
+def tags_list():
+    return render_template('tags.html', tags=tag_counts())
+
+def tag_counts():
+    """[(name, số bài)] của mọi tag đang được dùng, một query GROUP BY."""
+    return (db.session.query(Tag.name, db.func.count(post_tag.c.post_id))
+            .join(post_tag, post_tag.c.tag_id == Tag.id)
+            .group_by(Tag.id)
+            .order_by(db.func.count(post_tag.c.post_id).desc(), Tag.name)
+            .all())
+
+@bp.route('/search')
+@read_only
+def search_page():
+    q = request.args.get('q', '').strip()
+    page_no = max(request.args.get('page', 1, type=int), 1)
+    results, has_next = search.search_posts(q, page=page_no, per_page=current_app.config['PAGE_SIZE'])
+    return render_template('search.html', q=q, results=results, page_no=page_no, has_next=has_next)
+
+@bp.route('/works')
+@page_cache.cached
+@read_only
 def works_list():
-    works = Work.query.order_by(Work.id.desc()).all()
-    return render_template('work.html', works=works)
+    page = keyset_page(Work.query, Work.id, current_app.config['PAGE_SIZE'])
+    return render_template('work.html', works=page.items, page=page)
 
-@app.route('/roadmap')
+@bp.route('/roadmap')
+@page_cache.cached
+@read_only
 def roadmap_list():
-    roadmaps = Roadmap.query.all()
-    stage_progress = {}
-    roadmap_progress = {}
-    for r in roadmaps:
-        # roadmap progress
-        total_r = Task.query.join(Stage).filter(Stage.roadmap_id==r.id).count()
-        done_r = Task.query.join(Stage).filter(Stage.roadmap_id==r.id, Task.is_done==True).count()
-        roadmap_progress[r.id] = int(done_r * 100 / total_r) if total_r else 0
-
-        # stage progress
-        for s in r.stages:
-            total_s = Task.query.filter_by(stage_id=s.id).count()
-            done_s = Task.query.filter_by(stage_id=s.id, is_done=True).count()
-            stage_progress[s.id] = int(done_s * 100 / total_s) if total_s else 0
+    # chỉ tóm tắt từng roadmap; stages/tasks tải qua /api/roadmaps/<id> khi mở card
+    event_id = latest_event_id()
+    roadmaps = db.session.query(*ROADMAP_SUMMARY_COLUMNS).order_by(Roadmap.id).all()
+    return render_template('roadmap.html', roadmaps=roadmaps, event_id=event_id,
+                           roadmap_progress={r.id: compute_roadmap_progress(r) for r in roadmaps})
+
+# ---------------- Roadmap API ----------------
+ROADMAP_SUMMARY_COLUMNS = (Roadmap.id, Roadmap.title, Roadmap.description, Roadmap.task_done, Roadmap.task_total)
+
+def roadmap_summary(r):
+    return {'id': r.id, 'title': r.title, 'description': r.description or '',
+            'task_done': r.task_done, 'task_total': r.task_total, 'progress': compute_roadmap_progress(r)}
+
+# event_id đọc trước dữ liệu: client bỏ qua event SSE có id <= event_id vì dữ liệu đã chứa nó
+@bp.route('/api/roadmaps')
+@page_cache.cached
+@read_only
+def api_roadmaps():
+    event_id = latest_event_id()
+    rows = db.session.query(*ROADMAP_SUMMARY_COLUMNS).order_by(Roadmap.id).all()
+    return jsonify({'event_id': event_id, 'roadmaps': [roadmap_summary(r) for r in rows]})
+
+@bp.route('/api/roadmaps/<int:rid>')
+@page_cache.cached
+@read_only
+def api_roadmap_detail(rid):
+    event_id = latest_event_id()
+    roadmap = db.session.query(*ROADMAP_SUMMARY_COLUMNS).filter(Roadmap.id == rid).first()
+    if roadmap is None:
+        abort(404)
+    stages = (db.session.query(Stage.id, Stage.title, Stage.description, Stage.task_done, Stage.task_total)
+              .filter(Stage.roadmap_id == rid)
+              .order_by(Stage.order)
+              .all())
+    tasks = {s.id: [] for s in stages}
+    if stages:
+        for t in (db.session.query(Task.id, Task.stage_id, Task.title, Task.is_done)
+                  .filter(Task.stage_id.in_(list(tasks)))
+                  .order_by(Task.stage_id, Task.id)):
+            tasks[t.stage_id].append({'id': t.id, 'title': t.title, 'is_done': bool(t.is_done)})
+    return jsonify({
+        'event_id': event_id,
+        **roadmap_summary(roadmap),
+        'stages': [{'id': s.id, 'title': s.title, 'description': s.description or '',
+                    'task_done': s.task_done, 'task_total': s.task_total,
+                    'progress': compute_stage_progress(s), 'tasks': tasks[s.id]} for s in stages],
+    })
 
-    return render_template('roadmap.html', roadmaps=roadmaps, stage_progress=stage_progress, roadmap_progress=roadmap_progress)
+# số stream SSE đang mở trong process này (mỗi stream giữ một thread của worker)
+_open_streams = 0
+_streams_lock = threading.Lock()
+
+def _acquire_stream_slot(limit):
+    global _open_streams
+    with _streams_lock:
+        if _open_streams >= limit:
+            return False
+        _open_streams += 1
+        return True
+
+def _release_stream_slot():
+    global _open_streams
+    with _streams_lock:
+        _open_streams -= 1
+
+
+@bp.route('/roadmap/events')
+@read_only
+def roadmap_events():
+    """Server-Sent Events: tiến độ task/stage/roadmap mỗi khi có task đổi trạng thái.
+
+    Đọc bảng progress_event mỗi ROADMAP_EVENTS_POLL giây nên mọi worker đều
+    thấy thay đổi của nhau. Stream tự đóng sau ROADMAP_EVENTS_MAX_SECONDS;
+    EventSource tự kết nối lại với Last-Event-ID. Mỗi process chỉ giữ tối đa
+    ROADMAP_EVENTS_MAX_STREAMS stream: quá số đó thì gửi event đang chờ rồi
+    đóng ngay với retry ROADMAP_EVENTS_BUSY_RETRY giây (client chuyển sang
+    poll thưa), để các trang khác luôn còn thread. Nếu event cần gửi đã bị
+    dọn, gửi "reset" để client tải lại từ API.
+    """
+    config = current_app.config
+    poll = config['ROADMAP_EVENTS_POLL']
+    batch = 100
+    deadline = time.monotonic() + config['ROADMAP_EVENTS_MAX_SECONDS']
+    last_id = sqlite_int(request.headers.get('Last-Event-ID', type=int))
+    if last_id is None:
+        last_id = sqlite_int(request.args.get('since', type=int))
+
+    def stream():
+        nonlocal last_id
+        # giành slot trong generator: client ngắt trước khi stream chạy thì không rò slot
+        held = _acquire_stream_slot(config['ROADMAP_EVENTS_MAX_STREAMS'])
+        try:
+            retry = poll if held else config['ROADMAP_EVENTS_BUSY_RETRY']
+            latest = latest_event_id()
+            yield f'retry: {int(retry * 1000)}\n\n'
+            if last_id is None or last_id > latest:
+                if last_id is not None:
+                    yield f'id: {latest}\nevent: reset\ndata: {{}}\n\n'
+                last_id = latest
+            while True:
+                rows = events_since(last_id, limit=batch)
+                # không giữ connection (và snapshot đọc) giữa các lần poll
+                db.session.remove()
+                if rows and rows[0].id > last_id + 1:
+                    last_id = rows[-1].id
+                    yield f'id: {last_id}\nevent: reset\ndata: {{}}\n\n'
+                    continue
+                for event_id, payload in rows:
+                    last_id = event_id
+                    yield f'id: {event_id}\nevent: progress\ndata: {payload}\n\n'
+                if len(rows) == batch:
+                    continue  # còn event dồn lại, gửi tiếp không chờ
+                if not held or time.monotonic() >= deadline:
+                    return
+                time.sleep(poll)
+        finally:
+            if held:
+                _release_stream_slot()
+
+    return Response(stream_with_context(stream()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 
 # ---------------- Admin Auth ----------------
@@ -67,39 +281,50 @@ def login_required(f):
     @wraps(f)
     def wrapper(*args, **kwargs):
         if not session.get('admin'):
-            return redirect(url_for('admin_login'))
+            return redirect(url_for('main.admin_login'))
         return f(*args, **kwargs)
     return wrapper
 
-@app.route('/admin/login', methods=['GET','POST'])
+@bp.route('/admin/login', methods=['GET','POST'])
 def admin_login():
     if request.method == 'POST':
         if request.form.get('username') == ADMIN_USER and request.form.get('password') == ADMIN_PASS:
             session['admin'] = True
-            return redirect(url_for('admin_index'))
+            return redirect(url_for('main.admin_index'))
         flash('Sai username hoặc password!', 'error')
     return render_template('admin/admin_login.html')
 
-@app.route('/admin/logout')
+@bp.route('/admin/logout')
 def admin_logout():
     session.pop('admin', None)
-    return redirect(url_for('admin_login'))
+    return redirect(url_for('main.admin_login'))
 
-@app.route('/admin')
+@bp.route('/admin')
 @login_required
 def admin_index():
     post_count = Post.query.count()
     work_count = Work.query.count()
     return render_template('admin/admin_dashboard.html', post_count=post_count, work_count=work_count)
 
+@bp.route('/admin/cache')
+@login_required
+def admin_cache_stats():
+    return jsonify(page_cache.info())
+
+@bp.route('/admin/metrics')
+@login_required
+def admin_metrics():
+    # số liệu của riêng process đang trả lời (mỗi worker gunicorn một bộ)
+    return jsonify(instrumentation.info())
+
 # ---------------- Posts CRUD ----------------
-@app.route('/admin/posts')
+@bp.route('/admin/posts')
 @login_required
 def admin_posts():
-    posts = Post.query.order_by(Post.id.desc()).all()
-    return render_template('admin/admin_posts.html', posts=posts)
+    page = keyset_page(Post.query.options(load_only(Post.id, Post.title, Post.date)), Post.id, current_app.config['ADMIN_PAGE_SIZE'])
+    return render_template('admin/admin_posts.html', posts=page.items, page=page)
 
-@app.route('/admin/posts/new', methods=['GET','POST'])
+@bp.route('/admin/posts/new', methods=['GET','POST'])
 @login_required
 def admin_posts_new():
     if request.method == 'POST':
@@ -110,13 +335,15 @@ def admin_posts_new():
             desc=request.form.get('desc',''),
             content=request.form.get('content','')
         )
+        p.sync_tags()
+        p.render_content()
         db.session.add(p)
         db.session.commit()
         flash('Thêm bài viết mới thành công!', 'success')
-        return redirect(url_for('admin_posts'))
+        return redirect(url_for('main.admin_posts'))
     return render_template('admin/admin_post_form.html', mode='new')
 
-@app.route('/admin/posts/<int:pid>/edit', methods=['GET','POST'])
+@bp.route('/admin/posts/<int:pid>/edit', methods=['GET','POST'])
 @login_required
 def admin_posts_edit(pid):
     post = Post.query.get_or_404(pid)
@@ -126,28 +353,33 @@ def admin_posts_edit(pid):
         post.tags = request.form.get('tags','')
         post.desc = request.form.get('desc','')
         post.content = request.form.get('content','')
+        post.sync_tags()
+        post.render_content()
+        # tag vừa bị bỏ khỏi bài cuối cùng dùng nó: /tag/<name> phải về 404
+        prune_tags()
         db.session.commit()
         flash('Cập nhật bài viết thành công!', 'success')
-        return redirect(url_for('admin_posts'))
+        return redirect(url_for('main.admin_posts'))
     return render_template('admin/admin_post_form.html', mode='edit', post=post)
 
-@app.route('/admin/posts/<int:pid>/delete', methods=['POST'])
+@bp.route('/admin/posts/<int:pid>/delete', methods=['POST'])
 @login_required
 def admin_posts_delete(pid):
     post = Post.query.get_or_404(pid)
     db.session.delete(post)
+    prune_tags()
     db.session.commit()
     flash('Xóa bài viết thành công!', 'info')
-    return redirect(url_for('admin_posts'))
+    return redirect(url_for('main.admin_posts'))
 
 # ---------------- Works CRUD ----------------
-@app.route('/admin/works')
+@bp.route('/admin/works')
 @login_required
 def admin_works():
-    works = Work.query.order_by(Work.id.desc()).all()
-    return render_template('admin/admin_works.html', works=works)
+    page = keyset_page(Work.query, Work.id, current_app.config['ADMIN_PAGE_SIZE'])
+    return render_template('admin/admin_works.html', works=page.items, page=page)
 
-@app.route('/admin/works/new', methods=['GET','POST'])
+@bp.route('/admin/works/new', methods=['GET','POST'])
 @login_required
 def admin_works_new():
     if request.method == 'POST':
@@ -160,11 +392,14 @@ def admin_works_new():
         )
         db.session.add(w)
         db.session.commit()
+        if w.image:
+            # thread nền cần app thật, không phải proxy current_app
+            images.schedule(current_app._get_current_object(), w.id)
         flash('Thêm dự án mới thành công!', 'success')
-        return redirect(url_for('admin_works'))
+        return redirect(url_for('main.admin_works'))
     return render_template('admin/admin_work_form.html', mode='new')
 
-@app.route('/admin/works/<int:wid>/edit', methods=['GET','POST'])
+@bp.route('/admin/works/<int:wid>/edit', methods=['GET','POST'])
 @login_required
 def admin_works_edit(wid):
     work = Work.query.get_or_404(wid)
@@ -175,27 +410,31 @@ def admin_works_edit(wid):
         work.desc = request.form.get('desc','')
         work.image = request.form.get('image','')
         db.session.commit()
+        # ảnh thu nhỏ sinh ở thread nền; đến khi xong template dùng ảnh gốc (image_set = None)
+        if work.image and work.image_set is None:
+            images.schedule(current_app._get_current_object(), work.id)
         flash('Cập nhật dự án thành công!', 'success')
-        return redirect(url_for('admin_works'))
+        return redirect(url_for('main.admin_works'))
     return render_template('admin/admin_work_form.html', mode='edit', work=work)
 
-@app.route('/admin/works/<int:wid>/delete', methods=['POST'])
+@bp.route('/admin/works/<int:wid>/delete', methods=['POST'])
 @login_required
 def admin_works_delete(wid):
     w = Work.query.get_or_404(wid)
     db.session.delete(w)
     db.session.commit()
+    images.remove(current_app, wid)
     flash('Xóa dự án thành công!', 'info')
-    return redirect(url_for('admin_works'))
+    return redirect(url_for('main.admin_works'))
 
 # ---------------- Roadmaps CRUD ----------------
-@app.route('/admin/roadmaps')
+@bp.route('/admin/roadmaps')
 @login_required
 def admin_roadmaps():
     roadmaps = Roadmap.query.all()
     return render_template('admin/admin_roadmaps.html', roadmaps=roadmaps)
 
-@app.route('/admin/roadmaps/new', methods=['GET','POST'])
+@bp.route('/admin/roadmaps/new', methods=['GET','POST'])
 @login_required
 def admin_roadmaps_new():
     if request.method == 'POST':
@@ -206,10 +445,10 @@ def admin_roadmaps_new():
         db.session.add(r)
         db.session.commit()
         flash('Thêm lộ trình mới thành công!', 'success')
-        return redirect(url_for('admin_roadmaps'))
+        return redirect(url_for('main.admin_roadmaps'))
     return render_template('admin/admin_roadmap_form.html', mode='new')
 
-@app.route('/admin/roadmaps/<int:rid>/edit', methods=['GET','POST'])
+@bp.route('/admin/roadmaps/<int:rid>/edit', methods=['GET','POST'])
 @login_required
 def admin_roadmaps_edit(rid):
     r = Roadmap.query.get_or_404(rid)
@@ -218,27 +457,70 @@ def admin_roadmaps_edit(rid):
         r.description = request.form.get('description','')
         db.session.commit()
         flash('Cập nhật lộ trình thành công!', 'success')
-        return redirect(url_for('admin_roadmaps'))
+        return redirect(url_for('main.admin_roadmaps'))
     return render_template('admin/admin_roadmap_form.html', mode='edit', roadmap=r)
 
-@app.route('/admin/roadmaps/<int:rid>/delete', methods=['POST'])
+@bp.route('/admin/roadmaps/<int:rid>/delete', methods=['POST'])
 @login_required
 def admin_roadmaps_delete(rid):
     r = Roadmap.query.get_or_404(rid)
     db.session.delete(r)
     db.session.commit()
     flash('Xóa lộ trình thành công!', 'info')
-    return redirect(url_for('admin_roadmaps'))
+    return redirect(url_for('main.admin_roadmaps'))
+
+# ---------------- Batch helpers ----------------
+def parse_ids(values):
+    """List id (int, không trùng, giữ thứ tự) từ JSON/form; None nếu không hợp lệ."""
+    if not isinstance(values, list) or len(values) > MAX_BATCH:
+        return None
+    ids = []
+    for v in values:
+        # chỉ int thật hoặc chuỗi chữ số: 1.5 hay true không được âm thầm thành id 1
+        if isinstance(v, str) and v.isascii() and v.isdigit():
+            v = int(v)
+        if sqlite_int(v) is None or v < 0:
+            return None
+        ids.append(v)
+    return list(dict.fromkeys(ids))
+
+def bulk_reorder(model, parent_column, parent_id, ids):
+    """Gán order = vị trí trong ids bằng một UPDATE ... CASE.
+
+    Kiểm tra quyền sở hữu bằng một SELECT; trả về list id không thuộc
+    parent (khi đó không ghi gì).
+    """
+    owned = {row_id for (row_id,) in db.session.query(model.id)
+             .filter(parent_column == parent_id, model.id.in_(ids))}
+    foreign = [i for i in ids if i not in owned]
+    if foreign or not ids:
+        return foreign
+    db.session.execute(
+        db.update(model)
+        .where(model.id.in_(ids))
+        .values(order=db.case({row_id: idx for idx, row_id in enumerate(ids, start=1)}, value=model.id))
+        .execution_options(synchronize_session=False))
+    return []
+
+def reorder_response(model, parent_column, parent_id):
+    ids = parse_ids((request.get_json(silent=True) or {}).get('order', []))
+    if ids is None:
+        return jsonify({'status': 'error', 'error': 'order phải là list id'}), 400
+    foreign = bulk_reorder(model, parent_column, parent_id, ids)
+    if foreign:
+        return jsonify({'status': 'error', 'error': 'id không thuộc danh sách này', 'ids': foreign}), 400
+    db.session.commit()
+    return jsonify({'status': 'ok'})
 
 # ---------------- Stages CRUD ----------------
-@app.route('/admin/roadmaps/<int:rid>/stages')
+@bp.route('/admin/roadmaps/<int:rid>/stages')
 @login_required
 def admin_stages(rid):
     roadmap = Roadmap.query.get_or_404(rid)
     stages = Stage.query.filter_by(roadmap_id=rid).order_by(Stage.order).all()
     return render_template('admin/admin_stages.html', roadmap=roadmap, stages=stages)
 
-@app.route('/admin/roadmaps/<int:rid>/stages/new', methods=['GET','POST'])
+@bp.route('/admin/roadmaps/<int:rid>/stages/new', methods=['GET','POST'])
 @login_required
 def admin_stages_new(rid):
     roadmap = Roadmap.query.get_or_404(rid)
@@ -254,10 +536,10 @@ def admin_stages_new(rid):
         db.session.add(stage)
         db.session.commit()
         flash('Thêm stage thành công!', 'success')
-        return redirect(url_for('admin_stages', rid=rid))
+        return redirect(url_for('main.admin_stages', rid=rid))
     return render_template('admin/admin_stage_form.html', mode='new', roadmap=roadmap, stage=None)
 
-@app.route('/admin/stages/<int:sid>/edit', methods=['GET','POST'])
+@bp.route('/admin/stages/<int:sid>/edit', methods=['GET','POST'])
 @login_required
 def admin_stages_edit(sid):
     stage = Stage.query.get_or_404(sid)
@@ -267,54 +549,42 @@ def admin_stages_edit(sid):
         stage.order = int(request.form.get('order') or stage.order)
         db.session.commit()
         flash('Cập nhật stage thành công!', 'success')
-        return redirect(url_for('admin_stages', rid=stage.roadmap_id))
+        return redirect(url_for('main.admin_stages', rid=stage.roadmap_id))
     return render_template('admin/admin_stage_form.html', mode='edit', roadmap=stage.roadmap, stage=stage)
 
-@app.route('/admin/stages/<int:sid>/delete', methods=['POST'])
+@bp.route('/admin/stages/<int:sid>/delete', methods=['POST'])
 @login_required
 def admin_stages_delete(sid):
     stage = Stage.query.get_or_404(sid)
     rid = stage.roadmap_id
+    # tasks bị xóa theo stage -> trừ phần của stage khỏi roadmap
+    bump_roadmap_counters(rid, total=-stage.task_total, done=-stage.task_done)
     db.session.delete(stage)
     db.session.commit()
     flash('Xóa stage thành công!', 'info')
-    return redirect(url_for('admin_stages', rid=rid))
+    return redirect(url_for('main.admin_stages', rid=rid))
 
-@app.route('/admin/roadmaps/<int:rid>/stages/reorder', methods=['POST'])
+@bp.route('/admin/roadmaps/<int:rid>/stages/reorder', methods=['POST'])
 @login_required
 def admin_stages_reorder(rid):
-    data = request.get_json()
-    order_list = data.get('order', [])
-    for idx, sid in enumerate(order_list, start=1):
-        s = Stage.query.filter_by(id=sid, roadmap_id=rid).first()
-        if s:
-            s.order = idx
-    db.session.commit()
-    return jsonify({'status': 'ok'})
+    return reorder_response(Stage, Stage.roadmap_id, rid)
 
+# ---------------- Progress ----------------
 def compute_stage_progress(stage):
-    total = Task.query.filter_by(stage_id=stage.id).count()
-    if total == 0:
-        return 0
-    done = Task.query.filter_by(stage_id=stage.id, is_done=True).count()
-    return int(done * 100 / total)
+    return percent(stage.task_done, stage.task_total)
 
 def compute_roadmap_progress(roadmap):
-    total = Task.query.join(Stage).filter(Stage.roadmap_id==roadmap.id).count()
-    if total == 0:
-        return 0
-    done = Task.query.join(Stage).filter(Stage.roadmap_id==roadmap.id, Task.is_done==True).count()
-    return int(done * 100 / total)
+    return percent(roadmap.task_done, roadmap.task_total)
 
 # ---------------- Tasks (Admin CRUD) ----------------
-@app.route('/admin/stages/<int:sid>/tasks')
+@bp.route('/admin/stages/<int:sid>/tasks')
 @login_required
 def admin_tasks(sid):
     stage = Stage.query.get_or_404(sid)
     tasks = Task.query.filter_by(stage_id=sid).order_by(Task.order).all()
     return render_template('admin/admin_tasks.html', stage=stage, tasks=tasks)
 
-@app.route('/admin/stages/<int:sid>/tasks/new', methods=['GET','POST'])
+@bp.route('/admin/stages/<int:sid>/tasks/new', methods=['GET','POST'])
 @login_required
 def admin_tasks_new(sid):
     stage = Stage.query.get_or_404(sid)
@@ -329,12 +599,13 @@ def admin_tasks_new(sid):
             is_done=bool(request.form.get('is_done'))
         )
         db.session.add(t)
+        bump_counters(sid, total=1, done=1 if t.is_done else 0)
         db.session.commit()
         flash('Thêm task thành công!', 'success')
-        return redirect(url_for('admin_tasks', sid=sid))
+        return redirect(url_for('main.admin_tasks', sid=sid))
     return render_template('admin/admin_task_form.html', mode='new', stage=stage, task=None)
 
-@app.route('/admin/tasks/<int:tid>/edit', methods=['GET','POST'])
+@bp.route('/admin/tasks/<int:tid>/edit', methods=['GET','POST'])
 @login_required
 def admin_tasks_edit(tid):
     task = Task.query.get_or_404(tid)
@@ -342,52 +613,220 @@ def admin_tasks_edit(tid):
         task.title = request.form['title']
         task.description = request.form.get('description','')
         task.order = int(request.form.get('order') or task.order)
+        was_done = bool(task.is_done)
         task.is_done = bool(request.form.get('is_done'))
+        if task.is_done != was_done:
+            bump_counters(task.stage_id, done=1 if task.is_done else -1)
         db.session.commit()
         flash('Cập nhật task thành công!', 'success')
-        return redirect(url_for('admin_tasks', sid=task.stage_id))
+        return redirect(url_for('main.admin_tasks', sid=task.stage_id))
     return render_template('admin/admin_task_form.html', mode='edit', stage=task.stage, task=task)
 
-@app.route('/admin/tasks/<int:tid>/delete', methods=['POST'])
+@bp.route('/admin/tasks/<int:tid>/delete', methods=['POST'])
 @login_required
 def admin_tasks_delete(tid):
     task = Task.query.get_or_404(tid)
     sid = task.stage_id
+    bump_counters(sid, total=-1, done=-1 if task.is_done else 0)
     db.session.delete(task)
     db.session.commit()
     flash('Xóa task thành công!', 'info')
-    return redirect(url_for('admin_tasks', sid=sid))
+    return redirect(url_for('main.admin_tasks', sid=sid))
 
-@app.route('/admin/stages/<int:sid>/tasks/reorder', methods=['POST'])
+@bp.route('/admin/stages/<int:sid>/tasks/reorder', methods=['POST'])
 @login_required
 def admin_tasks_reorder(sid):
-    data = request.get_json()
-    order_list = data.get('order', [])
-    for idx, tid in enumerate(order_list, start=1):
-        t = Task.query.filter_by(id=tid, stage_id=sid).first()
-        if t:
-            t.order = idx
+    return reorder_response(Task, Task.stage_id, sid)
+
+@bp.route('/admin/stages/<int:sid>/tasks/bulk', methods=['POST'])
+@login_required
+def admin_tasks_bulk(sid):
+    # form từ admin_tasks.html (redirect) hoặc JSON {ids, action} (trả progress)
+    Stage.query.get_or_404(sid)
+    if request.is_json:
+        data = request.get_json(silent=True) or {}
+        ids, action = parse_ids(data.get('ids')), data.get('action')
+    else:
+        ids, action = parse_ids(request.form.getlist('ids')), request.form.get('action')
+    if not ids or action not in ('done', 'undone', 'delete'):
+        if request.is_json:
+            return jsonify({'status': 'error', 'error': 'cần ids và action done/undone/delete'}), 400
+        flash('Chọn ít nhất một task và một hành động.', 'warning')
+        return redirect(url_for('main.admin_tasks', sid=sid))
+
+    if action == 'delete':
+        result = delete_tasks(sid, ids)
+        count = result['deleted']
+    else:
+        result = set_tasks_done(ids, is_done=action == 'done', stage_id=sid)
+        count = len(result['tasks'])
     db.session.commit()
-    return jsonify({'status':'ok'})
+    if request.is_json:
+        return jsonify({'status': 'ok', **result})
+    flash(f'Đã cập nhật {count} task.', 'success')
+    return redirect(url_for('main.admin_tasks', sid=sid))
 
 
-@app.route('/roadmap/task/<int:tid>/toggle', methods=['POST'])
+@bp.route('/roadmap/task/<int:tid>/toggle', methods=['POST'])
 def roadmap_task_toggle(tid):
-    t = Task.query.get_or_404(tid)
-    t.is_done = not t.is_done
+    # flip + cộng dồn bộ đếm bằng UPDATE ... RETURNING, không cần COUNT
+    result = toggle_task(tid)
+    if result is None:
+        abort(404)
     db.session.commit()
-    stage = t.stage
-    roadmap = stage.roadmap
-    sp = compute_stage_progress(stage)
-    rp = compute_roadmap_progress(roadmap)
-    return jsonify({
-        'status':'ok',
-        'is_done': t.is_done,
-        'stage_progress': sp,
-        'roadmap_progress': rp,
-        'stage_id': stage.id,
-        'roadmap_id': roadmap.id
-    })
+    return jsonify({'status': 'ok', **result})
+
+@bp.route('/roadmap/tasks/toggle', methods=['POST'])
+def roadmap_tasks_toggle():
+    # {ids: [...], is_done: true/false} đặt trạng thái, bỏ is_done thì đảo từng task
+    data = request.get_json(silent=True) or {}
+    ids = parse_ids(data.get('ids'))
+    is_done = data.get('is_done')
+    if not ids or not (is_done is None or isinstance(is_done, bool)):
+        return jsonify({'status': 'error', 'error': f'ids phải là list 1..{MAX_BATCH} id, is_done là bool'}), 400
+    result = set_tasks_done(ids, is_done)
+    db.session.commit()
+    return jsonify({'status': 'ok', **result})
+
+
+# ---------------- CLI ----------------
+@bp.cli.command('db-upgrade')
+def db_upgrade_command():
+    """Áp dụng các migration chưa chạy (app cũng tự chạy khi khởi động)."""
+    applied = run_migrations(log=click.echo)
+    if not applied:
+        click.echo(f'Schema đã ở phiên bản mới nhất ({current_version()}).')
+
+@bp.cli.command('db-status')
+def db_status_command():
+    """In phiên bản schema hiện tại và các migration đã biết."""
+    version = current_version()
+    for number, description, _ in MIGRATIONS:
+        click.echo(f'[{"x" if number <= version else " "}] {number}: {description}')
+
+@bp.cli.command('db-explain')
+@click.option('--repeat', default=20, show_default=True)
+def db_explain_command(repeat):
+    """In EXPLAIN QUERY PLAN và thời gian trung bình của các query nóng."""
+    for name, plan, avg_ms in explain_hot_queries(repeat=repeat):
+        click.echo(f'{name}: {avg_ms:.3f} ms')
+        for line in plan:
+            click.echo(f'    {line}')
+
+@bp.cli.command('reconcile-progress')
+def reconcile_progress_command():
+    """Tính lại task_total/task_done của stage và roadmap, in ra các dòng bị lệch."""
+    drift = rebuild_counters()
+    for kind, row_id, stored, expected in drift:
+        click.echo(f'{kind} {row_id}: {stored[0]}/{stored[1]} -> {expected[0]}/{expected[1]}')
+    click.echo(f'{len(drift)} dòng bị lệch đã được sửa.' if drift else 'Bộ đếm khớp, không có lệch.')
+
+@bp.cli.command('search-rebuild')
+def search_rebuild_command():
+    """Đánh index FTS lại toàn bộ bài viết (dùng cho blog.db có sẵn)."""
+    count = search.rebuild_index()
+    db.session.commit()
+    click.echo(f'Đã index {count} bài viết.')
+
+@bp.cli.command('posts-render')
+@click.option('--all', 'force', is_flag=True, help='Render lại mọi bài, kể cả bài đã đúng phiên bản.')
+@click.option('--workers', type=int, default=None, help='Số process (mặc định = số CPU).')
+def posts_render_command(force, workers):
+    """Render lại Markdown -> HTML khi RENDERER_VERSION thay đổi."""
+    count = render_posts(force=force, workers=workers)
+    click.echo(f'Đã render {count} bài viết (renderer v{RENDERER_VERSION}).')
+
+@bp.cli.command('assets-build')
+def assets_build_command():
+    """Tạo static/dist: file có hash nội dung, bản .gz/.br và manifest.json."""
+    # ảnh thu nhỏ của work đã có tên theo hash, không cần qua pipeline
+    stats = build_assets(current_app.static_folder, exclude=(current_app.config['WORK_IMAGE_DIR'],))
+    assets.load_manifest()
+    # trang đã cache còn trỏ tới URL asset cũ
+    page_cache.bump()
+    click.echo(f'{stats["files"]} file ({stats["bytes"]} B), nén {stats["compressed"]} file: '
+               f'gzip {stats["gz_bytes"]} B, brotli {stats["br_bytes"] or "-"} B; xóa {stats["removed"]} file cũ.')
+    if not stats['brotli']:
+        click.echo('Chưa cài brotli: chỉ tạo bản .gz.')
+
+@bp.cli.command('works-images')
+@click.option('--all', 'force', is_flag=True, help='Sinh lại cả các work đã có ảnh thu nhỏ.')
+def works_images_command(force):
+    """Sinh ảnh thu nhỏ WebP/JPEG cho các work (chạy tuần tự, dùng cho dữ liệu cũ)."""
+    done = skipped = 0
+    for work in Work.query.filter(Work.image != '').order_by(Work.id).all():
+        if not force and work.image_set is not None:
+            skipped += 1
+            continue
+        if images.generate(current_app, work.id):
+            done += 1
+        else:
+            click.echo(f'  work {work.id}: không đọc được {work.image}')
+    click.echo(f'Đã sinh ảnh cho {done} work, bỏ qua {skipped} work đã có.')
+
+@bp.cli.command('export-static')
+@click.argument('directory', type=click.Path(file_okay=False))
+@click.option('--workers', type=int, default=None, help='Số process render (mặc định = số CPU).')
+@click.option('--all', 'force', is_flag=True, help='Bỏ qua manifest, render lại mọi trang.')
+def export_static_command(directory, workers, force):
+    """Xuất home, blog, mọi bài viết, works và roadmap ra HTML tĩnh (chỉ trang đã đổi)."""
+    stats = export.export_site(current_app, directory, workers=workers, force=force, log=click.echo)
+    click.echo(f'{stats["pages"]} trang: render lại {stats["rebuilt"]}, bỏ qua {stats["skipped"]}, '
+               f'xóa {stats["removed"]}, lỗi {stats["failed"]}; chép {stats["static"]} file static '
+               f'({stats["seconds"]} s).')
+
+@bp.cli.command('tags-migrate')
+def tags_migrate_command():
+    """Tách tag từ Post.tags vào bảng tag/post_tag cho toàn bộ bài viết."""
+    count = migrate_tags()
+    click.echo(f'Đã đồng bộ tag cho {count} bài viết.')
+
+@bp.cli.command('export-jsonl')
+@click.argument('output', type=click.File('w', encoding='utf-8'), default='-')
+@click.option('--only', 'types', multiple=True, type=click.Choice(transfer.TYPES),
+              help='Chỉ xuất loại này (lặp lại được). Mặc định: tất cả.')
+@click.option('--chunk-size', default=1000, show_default=True, help='Số dòng đọc mỗi lần từ DB.')
+def export_jsonl_command(output, types, chunk_size):
+    """Xuất post, work và roadmap (kèm stages/tasks) ra JSONL; '-' là stdout."""
+    started = time.perf_counter()
+    counts = transfer.export_jsonl(output, types or transfer.TYPES, chunk_size=chunk_size)
+    seconds = time.perf_counter() - started
+    summary = ', '.join(f'{n} {kind}' for kind, n in counts.items())
+    click.echo(f'Đã xuất {summary} ({seconds:.2f} s, {sum(counts.values()) / max(seconds, 1e-9):.0f} bản ghi/s).',
+               err=True)
+
+@bp.cli.command('import-jsonl')
+@click.argument('source', type=click.File('r', encoding='utf-8'))
+@click.option('--upsert', is_flag=True, help='Ghi đè dòng đã có cùng id thay vì báo lỗi.')
+@click.option('--chunk-size', default=1000, show_default=True, help='Số dòng ghi trong mỗi transaction.')
+@click.option('--workers', type=int, default=None, help='Số process render Markdown (mặc định = số CPU).')
+def import_jsonl_command(source, upsert, chunk_size, workers):
+    """Nhập file JSONL do export-jsonl tạo ra; '-' là stdin."""
+    try:
+        stats = transfer.import_jsonl(source, upsert=upsert, chunk_size=chunk_size, workers=workers)
+    except ValueError as e:
+        raise click.ClickException(f'{e} (các chunk trước đó đã được ghi).')
+    except IntegrityError as e:
+        # chỉ trùng khóa chính mới gợi ý --upsert; NOT NULL/FOREIGN KEY là lỗi dữ liệu
+        message = str(e.orig)
+        hint = ' — dùng --upsert nếu id đã tồn tại' if message.startswith('UNIQUE') and message.endswith('.id') else ''
+        raise click.ClickException(f'{message}{hint} (các chunk trước đó đã được ghi).')
+    click.echo(f'Đã nhập {stats["post"]} post, {stats["work"]} work, {stats["roadmap"]} roadmap, '
+               f'{stats["stage"]} stage, {stats["task"]} task; render {stats["rendered"]} bài '
+               f'({stats["seconds"]} s, {stats["rows_per_s"]} dòng/s).')
+    if stats['work']:
+        click.echo('Chạy flask works-images để sinh ảnh thu nhỏ cho các work vừa nhập.')
+
+@bp.cli.command('search-bench')
+@click.option('--posts', default=50000, show_default=True)
+@click.option('--queries', default=200, show_default=True)
+def search_bench_command(posts, queries):
+    """Đo latency tìm kiếm trên một DB tạm sinh ngẫu nhiên."""
+    result = search.benchmark(n_posts=posts, n_queries=queries)
+    click.echo(' '.join(f'{k}={v}' for k, v in result.items()))
+
+
+app = create_app()
 
 
 if __name__ == '__main__':
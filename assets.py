@@ -0,0 +1,198 @@
+"""Static asset có fingerprint và bản nén sẵn (flask assets-build).
+
+Build chép mọi file trong static/ sang static/dist/ với tên có hash nội
+dung (css/style.3f2a9c1d7e4b.css), kèm bản .gz và .br cho các loại văn
+bản. manifest.json ánh xạ tên gốc -> tên có hash. Khi bật
+ASSETS_FINGERPRINT, url_for('static', filename=...) trong template trả
+về URL có hash, phục vụ với Cache-Control immutable một năm. Nginx có
+thể phục vụ thẳng thư mục này (gzip_static / brotli_static).
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+from flask import request, send_from_directory, url_for, abort
+
+try:
+    import brotli
+except ImportError:  # không có brotli thì chỉ tạo bản .gz
+    brotli = None
+
+DIST = 'dist'
+MANIFEST = 'manifest.json'
+HISTORY = '.builds.json'  # danh sách file của các lần build gần nhất
+KEEP_BUILDS = 3  # worker/trang cache còn dùng manifest cũ vẫn tải được file của build trước
+ONE_YEAR = 365 * 24 * 3600
+COMPRESSIBLE = {'.css', '.js', '.svg', '.json', '.txt', '.html', '.xml', '.ico', '.map'}
+MIN_COMPRESS_BYTES = 256
+
+_CSS_URL = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+
+
+def _hashed_name(name, data):
+    root, ext = posixpath.splitext(name)
+    return f'{root}.{hashlib.sha256(data).hexdigest()[:12]}{ext}'
+
+def _rewrite_css_urls(css, name, manifest):
+    """Đổi url(...) tương đối trong CSS sang tên có hash (đường dẫn vẫn tương đối)."""
+    base = posixpath.dirname(name)
+    def sub(m):
+        url = m.group(2)
+        if re.match(r'^(?:[a-z]+:|/|#)', url):
+            return m.group(0)
+        path, _, suffix = url.partition('?')
+        target = manifest.get(posixpath.normpath(posixpath.join(base, path)))
+        if target is None:
+            return m.group(0)
+        new = posixpath.relpath(target, base) + (f'?{suffix}' if suffix else '')
+        return f'url({m.group(1)}{new}{m.group(1)})'
+    return _CSS_URL.sub(sub, css)
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+def build_assets(static_folder, exclude=()):
+    """Build static/dist, bỏ qua các thư mục con cấp một trong exclude.
+
+    Trả về dict files, compressed, bytes, gz_bytes, br_bytes, removed, brotli.
+    """
+    dist = os.path.join(static_folder, DIST)
+    skip = {DIST, *exclude}
+    sources = []
+    for dirpath, dirnames, filenames in os.walk(static_folder):
+        if os.path.abspath(dirpath) == os.path.abspath(static_folder):
+            dirnames[:] = [d for d in dirnames if d not in skip]
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            sources.append(os.path.relpath(path, static_folder).replace(os.sep, '/'))
+    # CSS sau cùng để url(...) trỏ được tới tên có hash của ảnh/font
+    sources.sort(key=lambda n: (n.endswith('.css'), n))
+
+    manifest = {}
+    written = set()
+    stats = {'files': 0, 'compressed': 0, 'bytes': 0, 'gz_bytes': 0, 'br_bytes': 0, 'removed': 0,
+             'brotli': brotli is not None}
+    for name in sources:
+        with open(os.path.join(static_folder, name), 'rb') as f:
+            data = f.read()
+        if name.endswith('.css'):
+            data = _rewrite_css_urls(data.decode('utf-8'), name, manifest).encode('utf-8')
+        hashed = _hashed_name(name, data)
+        manifest[name] = hashed
+        target = os.path.join(dist, hashed)
+        written.add(os.path.normpath(target))
+        if not os.path.exists(target):
+            _write(target, data)
+        stats['files'] += 1
+        stats['bytes'] += len(data)
+
+        if posixpath.splitext(name)[1].lower() not in COMPRESSIBLE or len(data) < MIN_COMPRESS_BYTES:
+            continue
+        stats['compressed'] += 1
+        variants = [('.gz', lambda d: gzip.compress(d, 9, mtime=0), 'gz_bytes')]
+        if brotli is not None:
+            variants.append(('.br', lambda d: brotli.compress(d, quality=11), 'br_bytes'))
+        for suffix, compress, key in variants:
+            path = target + suffix
+            written.add(os.path.normpath(path))
+            if not os.path.exists(path):
+                _write(path, compress(data))
+            stats[key] += os.path.getsize(path)
+
+    # giữ file của KEEP_BUILDS lần build gần nhất, xóa phần còn lại
+    history_path = os.path.join(dist, HISTORY)
+    try:
+        with open(history_path) as f:
+            history = json.load(f)
+    except (FileNotFoundError, ValueError):
+        history = []
+    current = sorted(os.path.relpath(path, dist).replace(os.sep, '/') for path in written)
+    history = [current] + [files for files in history if files != current][:KEEP_BUILDS - 1]
+    keep = {os.path.normpath(os.path.join(dist, name)) for files in history for name in files}
+    keep.update(os.path.normpath(os.path.join(dist, name)) for name in (MANIFEST, HISTORY))
+    for dirpath, _, filenames in os.walk(dist):
+        for filename in filenames:
+            path = os.path.normpath(os.path.join(dirpath, filename))
+            if path not in keep:
+                os.remove(path)
+                stats['removed'] += 1
+    _write(history_path, json.dumps(history).encode())
+    # manifest ghi sau cùng: worker thấy manifest mới thì file của nó đã có đủ
+    _write(os.path.join(dist, MANIFEST), json.dumps(manifest, indent=2, sort_keys=True).encode())
+    return stats
+
+
+class Assets:
+    """url_for('static', ...) -> file có fingerprint trong static/dist nếu đã build."""
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self.manifest = {}
+        self.dist_folder = None
+        self._manifest_mtime = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.dist_folder = os.path.join(app.static_folder, DIST)
+        self.enabled = app.config.get('ASSETS_FINGERPRINT', False)
+        self.load_manifest()
+        app.add_url_rule(f'{app.static_url_path}/{DIST}/<path:filename>', 'assets', self.serve)
+        app.jinja_env.globals['url_for'] = self.url_for
+        if self.enabled:
+            app.before_request(self.refresh)
+
+    def load_manifest(self):
+        path = os.path.join(self.dist_folder, MANIFEST)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+            with open(path) as f:
+                self.manifest = json.load(f)
+        except (FileNotFoundError, ValueError):
+            mtime, self.manifest = None, {}
+        self._manifest_mtime = mtime
+        return self.manifest
+
+    def refresh(self):
+        """Đọc lại manifest nếu `flask assets-build` vừa chạy (một stat mỗi request)."""
+        try:
+            mtime = os.stat(os.path.join(self.dist_folder, MANIFEST)).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime != self._manifest_mtime:
+            self.load_manifest()
+
+    def url_for(self, endpoint, **values):
+        if endpoint == 'static' and self.enabled:
+            hashed = self.manifest.get(values.get('filename'))
+            if hashed is not None:
+                values['filename'] = hashed
+                endpoint = 'assets'
+        return url_for(endpoint, **values)
+
+    def serve(self, filename):
+        if filename in (MANIFEST, HISTORY):
+            abort(404)
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        encoding = None
+        for name, suffix in (('br', '.br'), ('gzip', '.gz')):
+            if request.accept_encodings[name] and os.path.isfile(os.path.join(self.dist_folder, filename + suffix)):
+                encoding = name
+                filename += suffix
+                break
+        resp = send_from_directory(self.dist_folder, filename, mimetype=mimetype, max_age=ONE_YEAR)
+        resp.headers['Cache-Control'] = f'public, max-age={ONE_YEAR}, immutable'
+        resp.vary.add('Accept-Encoding')
+        if encoding:
+            resp.headers['Content-Encoding'] = encoding
+        return resp
+
+
+assets = Assets()
@@ -0,0 +1 @@
+"""Công cụ đo hiệu năng cho blog (không phải test, chạy bằng python -m bench.<module>)."""
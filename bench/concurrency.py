@@ -0,0 +1,97 @@
+"""Đo reader/writer chạy song song trên nhiều process với từng profile SQLite.
+
+    python -m bench.concurrency --seconds 10 --readers 4 --writers 2
+
+Mỗi profile dùng một blog.db tạm riêng. Reader gọi GET /roadmap và /blog,
+writer gọi POST /roadmap/task/<id>/toggle, tất cả qua Flask test client
+trong process riêng (giống các worker gunicorn). Báo cáo số request/giây
+và số lỗi "database is locked" của mỗi vai trò.
+"""
+import argparse
+import multiprocessing as mp
+import os
+import random
+import tempfile
+import time
+
+READ_URLS = ('/roadmap', '/blog')
+
+
+def _load_app(profile, db_path):
+    os.environ['APP_CONFIG'] = profile
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+    os.environ['PAGE_CACHE_ENABLED'] = '0'  # đo database, không đo cache trang
+    from app import app
+    app.testing = True  # để exception (OperationalError) nổi lên tới worker
+    return app
+
+def _seed(profile, db_path, roadmaps, stages, tasks):
+    app = _load_app(profile, db_path)
+    from bench.seed import seed
+    with app.app_context():
+        return seed(posts=50, works=0, roadmaps=roadmaps, stages=stages, tasks=tasks)['tasks']
+
+def _worker(role, profile, db_path, n_tasks, seconds, barrier, results):
+    app = _load_app(profile, db_path)
+    from sqlalchemy.exc import OperationalError
+    client = app.test_client()
+    rnd = random.Random(os.getpid())
+    ok = locked = failed = 0
+    barrier.wait()
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        try:
+            if role == 'writer':
+                resp = client.post(f'/roadmap/task/{rnd.randint(1, n_tasks)}/toggle')
+            else:
+                resp = client.get(rnd.choice(READ_URLS))
+            if resp.status_code == 200:
+                ok += 1
+            else:
+                failed += 1
+        except OperationalError as e:
+            if 'locked' in str(e) or 'busy' in str(e):
+                locked += 1
+            else:
+                failed += 1
+    results.put((role, ok, locked, failed))
+
+def run_profile(profile, readers, writers, seconds, size):
+    ctx = mp.get_context('spawn')
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        with ctx.Pool(1) as pool:
+            n_tasks = pool.apply(_seed, (profile, db_path, *size))
+
+        barrier = ctx.Barrier(readers + writers)
+        results = ctx.Queue()
+        procs = [ctx.Process(target=_worker, args=(role, profile, db_path, n_tasks, seconds, barrier, results))
+                 for role in ['reader'] * readers + ['writer'] * writers]
+        for p in procs:
+            p.start()
+        totals = {'reader': [0, 0, 0], 'writer': [0, 0, 0]}
+        for _ in procs:
+            role, ok, locked, failed = results.get()
+            for i, v in enumerate((ok, locked, failed)):
+                totals[role][i] += v
+        for p in procs:
+            p.join()
+    return {role: {'ok': ok, 'rps': round(ok / seconds, 1), 'locked': locked, 'failed': failed}
+            for role, (ok, locked, failed) in totals.items()}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--profile', action='append', choices=['development', 'production'])
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--size', type=int, nargs=3, default=[10, 10, 20], metavar=('ROADMAPS', 'STAGES', 'TASKS'))
+    args = parser.parse_args()
+
+    for profile in args.profile or ['development', 'production']:
+        report = run_profile(profile, args.readers, args.writers, args.seconds, args.size)
+        for role, r in report.items():
+            print(f'{profile:12} {role:7} {r["rps"]:>8} req/s  ok={r["ok"]:<7} locked={r["locked"]:<5} failed={r["failed"]}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,414 @@
+"""Benchmark latency/throughput của mọi route public và admin.
+
+    python -m bench.run --posts 2000 --requests 200 --output bench/results.json
+    python -m bench.run --baseline bench/baseline.json        # so sánh, exit 1 nếu chậm đi
+
+Chạy qua Flask test client (trong process, đếm được số query SQL mỗi
+request) và qua gunicorn thật trên một port local (--no-gunicorn để bỏ).
+Mỗi route báo p50/p95/p99 (ms), request/giây, số query trung bình; mỗi
+chế độ báo peak RSS. roadmap_task_toggle còn được chạy song song với
+--concurrency thread. Route tạo/xóa dữ liệu (…/new, …/delete) không nằm
+trong bộ đo để các lần chạy so sánh được với nhau.
+"""
+import argparse
+import http.cookiejar
+import json
+import os
+import platform
+import resource
+import secrets
+import socket
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from bench import seed as seeding
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# ---------------- Routes ----------------
+class Route:
+    def __init__(self, name, path, method='GET', admin=False, body=None, concurrency=1):
+        self.name = name
+        self.path = path          # str hoặc hàm (i) -> str, i là số thứ tự request
+        self.method = method
+        self.admin = admin
+        self.body = body          # None, ('json', hàm i -> obj) hoặc ('form', hàm i -> dict)
+        self.concurrency = concurrency
+
+    def url(self, i):
+        return self.path(i) if callable(self.path) else self.path
+
+def build_routes(ids, concurrency):
+    """Danh sách Route với id thật lấy từ DB (xem sample_ids)."""
+    posts, tasks, stage_tasks = ids['posts'], ids['tasks'], ids['stage_tasks']
+    post_form = ids['post_form']
+    routes = [
+        Route('home', '/'),
+        Route('blog', '/blog'),
+        Route('blog_older', f'/blog?before={posts[len(posts) // 2]}'),
+        Route('post_detail', lambda i: f'/post/{posts[i % len(posts)]}'),
+        Route('tag_posts', f'/tag/{urllib.parse.quote(ids["tag"])}'),
+        Route('tags_list', '/tags'),
+        Route('search_page', lambda i: '/search?q=' + urllib.parse.quote(seeding.TOPICS[i % len(seeding.TOPICS)])),
+        Route('works_list', '/works'),
+        Route('roadmap_list', '/roadmap'),
+        Route('api_roadmaps', '/api/roadmaps'),
+        Route('api_roadmap_detail', f'/api/roadmaps/{ids["roadmap"]}'),
+        Route('roadmap_task_toggle', lambda i: f'/roadmap/task/{tasks[i % len(tasks)]}/toggle', 'POST'),
+        Route('roadmap_task_toggle@concurrent', lambda i: f'/roadmap/task/{tasks[i % len(tasks)]}/toggle', 'POST',
+              concurrency=concurrency),
+        Route('roadmap_tasks_toggle', '/roadmap/tasks/toggle', 'POST', body=('json', lambda i: {'ids': stage_tasks})),
+        Route('admin_index', '/admin', admin=True),
+        Route('admin_cache_stats', '/admin/cache', admin=True),
+        Route('admin_posts', '/admin/posts', admin=True),
+        Route('admin_posts_edit', f'/admin/posts/{posts[0]}/edit', admin=True),
+        Route('admin_posts_edit@save', f'/admin/posts/{posts[0]}/edit', 'POST', admin=True,
+              body=('form', lambda i: post_form)),
+        Route('admin_works', '/admin/works', admin=True),
+        Route('admin_roadmaps', '/admin/roadmaps', admin=True),
+        Route('admin_stages', f'/admin/roadmaps/{ids["roadmap"]}/stages', admin=True),
+        Route('admin_stages_reorder', f'/admin/roadmaps/{ids["roadmap"]}/stages/reorder', 'POST', admin=True,
+              body=('json', lambda i: {'order': ids['stages'][::-1 if i % 2 else 1]})),
+        Route('admin_tasks', f'/admin/stages/{ids["stage"]}/tasks', admin=True),
+        Route('admin_tasks_reorder', f'/admin/stages/{ids["stage"]}/tasks/reorder', 'POST', admin=True,
+              body=('json', lambda i: {'order': stage_tasks[::-1 if i % 2 else 1]})),
+    ]
+    if ids['work']:
+        routes.append(Route('admin_works_edit', f'/admin/works/{ids["work"]}/edit', admin=True))
+    return routes
+
+def sample_ids():
+    """Id dùng trong URL, lấy từ DB đã seed (cần app context)."""
+    from models import db, Post, Work, Roadmap, Stage, Task, Tag
+    roadmap = db.session.query(Roadmap.id).order_by(Roadmap.id).limit(1).scalar()
+    stage = db.session.query(Stage.id).filter_by(roadmap_id=roadmap).order_by(Stage.id).limit(1).scalar()
+    first = db.session.get(Post, db.session.query(Post.id).order_by(Post.id).limit(1).scalar())
+    return {
+        'posts': [pid for (pid,) in db.session.query(Post.id).order_by(Post.id).limit(200)],
+        'post_form': {'title': first.title, 'date': first.date, 'tags': first.tags,
+                      'desc': first.desc, 'content': first.content},
+        'tag': db.session.query(Tag.name).order_by(Tag.id).limit(1).scalar(),
+        'work': db.session.query(Work.id).order_by(Work.id).limit(1).scalar(),
+        'roadmap': roadmap,
+        'stages': [sid for (sid,) in db.session.query(Stage.id).filter_by(roadmap_id=roadmap)],
+        'stage': stage,
+        'stage_tasks': [tid for (tid,) in db.session.query(Task.id).filter_by(stage_id=stage)],
+        'tasks': [tid for (tid,) in db.session.query(Task.id).order_by(Task.id).limit(500)],
+    }
+
+
+# ---------------- Drivers ----------------
+class TestClientDriver:
+    """Gọi app trong process; mỗi thread có client khách và client admin riêng."""
+    name = 'testclient'
+
+    def __init__(self, app, user, password):
+        self.app = app
+        self.user, self.password = user, password
+        self.local = threading.local()
+
+    def _client(self, admin):
+        clients = self.local.__dict__.setdefault('clients', {})
+        if admin not in clients:
+            clients[admin] = self.app.test_client()
+            if admin:
+                clients[admin].post('/admin/login', data={'username': self.user, 'password': self.password})
+        return clients[admin]
+
+    def request(self, method, url, body=None, admin=False):
+        kwargs = {}
+        if body:
+            kwargs[body[0] if body[0] == 'json' else 'data'] = body[1]
+        resp = self._client(admin).open(url, method=method, **kwargs)
+        resp.close()
+        return resp.status_code
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+class HttpDriver:
+    """Gọi server thật qua HTTP; redirect không được follow (đo đúng một request)."""
+    name = 'gunicorn'
+
+    def __init__(self, base_url, user, password):
+        self.base_url = base_url
+        self.user, self.password = user, password
+        self.local = threading.local()
+
+    def _opener(self, admin):
+        openers = self.local.__dict__.setdefault('openers', {})
+        if admin not in openers:
+            openers[admin] = urllib.request.build_opener(
+                urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _NoRedirect)
+            if admin:
+                self.request('POST', '/admin/login', ('form', {'username': self.user, 'password': self.password}),
+                             admin=True)
+        return openers[admin]
+
+    def request(self, method, url, body=None, admin=False):
+        data, headers = None, {}
+        if body and body[0] == 'json':
+            data, headers = json.dumps(body[1]).encode(), {'Content-Type': 'application/json'}
+        elif body:
+            data = urllib.parse.urlencode(body[1]).encode()
+        req = urllib.request.Request(self.base_url + url, data=data, headers=headers, method=method)
+        try:
+            with self._opener(admin).open(req, timeout=60) as resp:
+                resp.read()
+                return resp.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+
+# ---------------- Measurement ----------------
+class QueryCounter:
+    def __init__(self, engines):
+        self.count = 0
+        self._lock = threading.Lock()
+        from sqlalchemy import event
+        for engine in engines:
+            event.listen(engine, 'before_cursor_execute', self._on_execute)
+
+    def _on_execute(self, *args):
+        with self._lock:
+            self.count += 1
+
+def _percentiles(timings):
+    if len(timings) < 2:
+        value = round(timings[0], 2) if timings else None
+        return value, value, value
+    cuts = statistics.quantiles(timings, n=100, method='inclusive')
+    return round(cuts[49], 2), round(cuts[94], 2), round(cuts[98], 2)
+
+def measure(driver, route, n, warmup=2, counter=None):
+    for i in range(warmup):
+        driver.request(route.method, route.url(i), route.body and (route.body[0], route.body[1](i)), route.admin)
+
+    def one(i):
+        body = route.body and (route.body[0], route.body[1](i))
+        started = time.perf_counter()
+        status = driver.request(route.method, route.url(i), body, route.admin)
+        return (time.perf_counter() - started) * 1000, status
+
+    queries_before = counter.count if counter else 0
+    started = time.perf_counter()
+    if route.concurrency > 1:
+        with ThreadPoolExecutor(route.concurrency) as pool:
+            results = list(pool.map(one, range(n)))
+    else:
+        results = [one(i) for i in range(n)]
+    wall = time.perf_counter() - started
+
+    timings = [ms for ms, _ in results]
+    p50, p95, p99 = _percentiles(timings)
+    return {
+        'requests': n,
+        'errors': sum(1 for _, status in results if status >= 400),
+        'p50_ms': p50, 'p95_ms': p95, 'p99_ms': p99,
+        'rps': round(n / wall, 1) if wall else None,
+        'queries': round((counter.count - queries_before) / n, 1) if counter else None,
+    }
+
+def run_routes(driver, routes, n, counter=None, log=print):
+    results = {}
+    for route in routes:
+        results[route.name] = stats = measure(driver, route, n, counter=counter)
+        log(f'  {driver.name:10} {route.name:32} p50 {stats["p50_ms"]:>8} p95 {stats["p95_ms"]:>8} '
+            f'p99 {stats["p99_ms"]:>8} ms  {stats["rps"]:>8} req/s  '
+            f'q={stats["queries"] if stats["queries"] is not None else "-":<5} err={stats["errors"]}')
+    return results
+
+
+# ---------------- gunicorn ----------------
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def _peak_rss_kb(pid):
+    # VmHWM = RSS cao nhất của process (Linux); None nếu không đọc được
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+
+def _children(pid):
+    kids = []
+    for entry in os.listdir('/proc') if os.path.isdir('/proc') else []:
+        if entry.isdigit():
+            try:
+                with open(f'/proc/{entry}/stat') as f:
+                    if int(f.read().rsplit(')', 1)[1].split()[1]) == pid:
+                        kids.append(int(entry))
+            except (OSError, IndexError, ValueError):
+                pass
+    return kids
+
+def run_gunicorn(routes, n, workers, user, password, log=print):
+    port = _free_port()
+    env = dict(os.environ, GUNICORN_BIND=f'127.0.0.1:{port}', GUNICORN_WORKERS=str(workers))
+    proc = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app'],
+                            cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    base_url = f'http://127.0.0.1:{port}'
+    try:
+        deadline = time.monotonic() + 120
+        while True:
+            if proc.poll() is not None:
+                raise RuntimeError('gunicorn không khởi động được:\n' + proc.stderr.read().decode())
+            try:
+                urllib.request.urlopen(base_url + '/', timeout=5).read()
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.2)
+        results = run_routes(HttpDriver(base_url, user, password), routes, n, log=log)
+        workers_rss = [_peak_rss_kb(pid) or 0 for pid in _children(proc.pid)]
+        rss = {'master_kb': _peak_rss_kb(proc.pid), 'worker_max_kb': max(workers_rss, default=None),
+               'workers_total_kb': sum(workers_rss) or None}
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+    return {'routes': results, 'peak_rss': rss}
+
+
+# ---------------- Baseline ----------------
+def compare(current, baseline, threshold, min_delta_ms=1.0):
+    """List dòng mô tả các route chậm đi hoặc chạy nhiều query hơn baseline."""
+    regressions = []
+    for mode, data in current['modes'].items():
+        base_mode = baseline.get('modes', {}).get(mode)
+        if not base_mode:
+            continue
+        for name, stats in data['routes'].items():
+            base = base_mode['routes'].get(name)
+            if not base:
+                continue
+            cur_p95, base_p95 = stats['p95_ms'], base['p95_ms']
+            if cur_p95 and base_p95 and cur_p95 > base_p95 * (1 + threshold) and cur_p95 - base_p95 > min_delta_ms:
+                regressions.append(f'{mode}/{name}: p95 {base_p95} -> {cur_p95} ms')
+            if stats['queries'] is not None and base.get('queries') is not None and stats['queries'] > base['queries']:
+                regressions.append(f'{mode}/{name}: queries {base["queries"]} -> {stats["queries"]}')
+            if stats['errors'] > base.get('errors', 0):
+                regressions.append(f'{mode}/{name}: errors {base.get("errors", 0)} -> {stats["errors"]}')
+        for key, value in data.get('peak_rss', {}).items():
+            base_value = base_mode.get('peak_rss', {}).get(key)
+            if value and base_value and value > base_value * (1 + threshold):
+                regressions.append(f'{mode}: peak RSS {key} {base_value} -> {value} KB')
+    return regressions
+
+
+def _git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', help='dùng DB có sẵn (mặc định: seed một DB tạm)')
+    seeding.add_arguments(parser)
+    parser.add_argument('--requests', type=int, default=100, help='số request đo cho mỗi route')
+    parser.add_argument('--concurrency', type=int, default=8, help='số thread cho kịch bản toggle song song')
+    parser.add_argument('--config', default='production', choices=['development', 'production'])
+    parser.add_argument('--page-cache', action='store_true', help='bật page cache (mặc định tắt để đo DB/render)')
+    parser.add_argument('--no-gunicorn', action='store_true')
+    parser.add_argument('--workers', type=int, default=4, help='số worker gunicorn')
+    parser.add_argument('--output', default='bench_results.json')
+    parser.add_argument('--baseline', help='file JSON kết quả trước đó để so sánh')
+    parser.add_argument('--threshold', type=float, default=0.2, help='p95 được phép chậm hơn baseline (0.2 = 20%%)')
+    args = parser.parse_args()
+
+    tmp = None
+    db_path = args.db
+    if not db_path:
+        tmp = tempfile.TemporaryDirectory()
+        db_path = os.path.join(tmp.name, 'bench.db')
+    user, password = 'bench', secrets.token_hex(8)
+    os.environ.update({
+        'DATABASE_URL': 'sqlite:///' + os.path.abspath(db_path),
+        'APP_CONFIG': args.config,
+        'PAGE_CACHE_ENABLED': '1' if args.page_cache else '0',
+        'ADMIN_USER': user,
+        'ADMIN_PASS': password,
+    })
+    os.chdir(ROOT)
+
+    seed_info = None
+    if not args.db:
+        # seed ở process riêng để RSS của nó không lẫn vào số đo
+        print('seeding...', flush=True)
+        cmd = [sys.executable, '-m', 'bench.seed', '--db', db_path, '--posts', str(args.posts),
+               '--works', str(args.works), '--roadmaps', str(args.roadmaps), '--stages', str(args.stages),
+               '--tasks', str(args.tasks), '--seed', str(args.seed)]
+        out = subprocess.run(cmd, cwd=ROOT, check=True, capture_output=True, text=True).stdout
+        seed_info = json.loads(out.strip().splitlines()[-1])
+
+    from app import app
+    from models import db
+    with app.app_context():
+        routes = build_routes(sample_ids(), args.concurrency)
+        engines = [db.engine] + [e for e in [app.extensions.get('sqlite_readonly_engine')] if e is not None]
+    counter = QueryCounter(engines)
+
+    report = {
+        'meta': {
+            'date': datetime.now().isoformat(timespec='seconds'),
+            'git': _git_revision(),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'config': args.config,
+            'page_cache': args.page_cache,
+            'requests_per_route': args.requests,
+            'concurrency': args.concurrency,
+            'seed': seed_info,
+        },
+        'modes': {},
+    }
+    print('testclient:', flush=True)
+    report['modes']['testclient'] = {
+        'routes': run_routes(TestClientDriver(app, user, password), routes, args.requests, counter),
+        # ru_maxrss là KB trên Linux
+        'peak_rss': {'process_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss},
+    }
+    if not args.no_gunicorn:
+        print(f'gunicorn ({args.workers} workers):', flush=True)
+        report['modes']['gunicorn'] = run_gunicorn(routes, args.requests, args.workers, user, password)
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f'-> {args.output}')
+    if tmp:
+        tmp.cleanup()
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        if regressions:
+            print(f'{len(regressions)} regression so với {args.baseline}:')
+            for line in regressions:
+                print('  ' + line)
+            sys.exit(1)
+        print(f'Không có regression so với {args.baseline} (ngưỡng {args.threshold:.0%}).')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+"""Sinh dữ liệu giả cho blog.db: bài viết Markdown, works và cây roadmap.
+
+    python -m bench.seed --db /tmp/bench.db --posts 2000 --roadmaps 20 --stages 10 --tasks 30
+
+Insert hàng loạt bằng Core rồi chạy lại các bước dẫn xuất (FTS, tag,
+HTML đã render, bộ đếm task) giống như migration, nên DB sinh ra giống
+hệt DB thật sau `flask db-upgrade`.
+"""
+import argparse
+import json
+import os
+import random
+import time
+
+TOPICS = ('python flask sqlite docker linux git react rust golang kubernetes postgres redis '
+          'nginx css html javascript typescript testing cache index query thread async').split()
+WORDS = ('trong khi với các một những được cho này của và là có không người để đã sẽ '
+         'học làm viết chạy đọc dữ liệu hệ thống ứng dụng hiệu năng phiên bản cấu hình '
+         'request response server client module hàm lớp biến vòng lặp lỗi kiểm tra').split()
+CATEGORIES = ('Web', 'Mobile', 'Backend', 'Data', 'DevOps', 'Design')
+
+
+def _sentence(rnd, n=None):
+    words = rnd.choices(WORDS + TOPICS, k=n or rnd.randint(6, 18))
+    return ' '.join(words).capitalize() + '.'
+
+def _paragraph(rnd):
+    return ' '.join(_sentence(rnd) for _ in range(rnd.randint(3, 7)))
+
+def markdown_post(rnd, target_bytes):
+    """Bài Markdown cỡ ~target_bytes: heading, đoạn văn, list, code block, bảng."""
+    parts = []
+    section = 0
+    while sum(len(p) for p in parts) < target_bytes:
+        section += 1
+        parts.append(f'## {section}. {_sentence(rnd, 4)[:-1]}')
+        parts.append(_paragraph(rnd))
+        kind = rnd.random()
+        if kind < 0.3:
+            parts.append('\n'.join(f'- {_sentence(rnd, 5)}' for _ in range(rnd.randint(3, 6))))
+        elif kind < 0.55:
+            body = '\n'.join(f'    result = {w}_{i}(data)  # {rnd.choice(WORDS)}'
+                             for i, w in enumerate(rnd.choices(TOPICS, k=rnd.randint(4, 12))))
+            parts.append(f'```python\ndef handler(data):\n{body}\n    return result\n```')
+        elif kind < 0.65:
+            rows = '\n'.join(f'| {rnd.choice(TOPICS)} | {rnd.randint(1, 999)} ms |' for _ in range(4))
+            parts.append(f'| Tên | Thời gian |\n|---|---|\n{rows}')
+        if rnd.random() < 0.3:
+            parts.append(f'### {_sentence(rnd, 3)[:-1]}\n\n{_paragraph(rnd)}')
+    return '\n\n'.join(parts)
+
+
+def seed(posts=500, works=30, roadmaps=10, stages=8, tasks=20, post_kb=(2, 20), random_seed=0):
+    """Chèn dữ liệu vào DB của app hiện tại (cần app context). Trả về dict số dòng và thời gian."""
+    from models import db, Post, Work, Roadmap, Stage, Task
+    from migrations import migrate_tags, render_posts
+    from progress import rebuild_counters
+    import search
+
+    rnd = random.Random(random_seed)
+    started = time.perf_counter()
+    chunk = 500
+    for start in range(0, posts, chunk):
+        db.session.execute(db.insert(Post), [{
+            'title': _sentence(rnd, rnd.randint(4, 9))[:-1][:200],
+            'date': f'2025-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}',
+            'tags': ', '.join(rnd.sample(TOPICS, rnd.randint(1, 4))),
+            'desc': _sentence(rnd, 25),
+            'content': markdown_post(rnd, rnd.randint(*post_kb) * 1024),
+        } for _ in range(start, min(posts, start + chunk))])
+    if works:
+        db.session.execute(db.insert(Work), [{
+            'title': f'{rnd.choice(TOPICS).title()} {_sentence(rnd, 2)[:-1]}',
+            'year': str(rnd.randint(2015, 2025)),
+            'category': rnd.choice(CATEGORIES),
+            'desc': _paragraph(rnd),
+            'image': '',
+        } for _ in range(works)])
+    for r in range(roadmaps):
+        rid = db.session.execute(db.insert(Roadmap).values(
+            title=f'Roadmap {rnd.choice(TOPICS)} {r + 1}', description=_sentence(rnd))).inserted_primary_key[0]
+        for s in range(stages):
+            sid = db.session.execute(db.insert(Stage).values(
+                roadmap_id=rid, title=_sentence(rnd, 3)[:-1], description=_sentence(rnd), order=s + 1,
+            )).inserted_primary_key[0]
+            if tasks:
+                db.session.execute(db.insert(Task), [{
+                    'stage_id': sid, 'title': _sentence(rnd, 5)[:-1], 'description': _sentence(rnd),
+                    'is_done': rnd.random() < 0.4, 'order': t + 1,
+                } for t in range(tasks)])
+    db.session.commit()
+    inserted = time.perf_counter()
+
+    # insert bằng Core không đi qua mapper event -> dựng lại dữ liệu dẫn xuất
+    search.rebuild_index()
+    db.session.commit()
+    migrate_tags()
+    render_posts(force=True)
+    rebuild_counters()
+    return {
+        'posts': posts, 'works': works, 'roadmaps': roadmaps,
+        'stages': roadmaps * stages, 'tasks': roadmaps * stages * tasks,
+        'insert_s': round(inserted - started, 2),
+        'derive_s': round(time.perf_counter() - inserted, 2),
+    }
+
+
+def add_arguments(parser):
+    parser.add_argument('--posts', type=int, default=500)
+    parser.add_argument('--works', type=int, default=30)
+    parser.add_argument('--roadmaps', type=int, default=10)
+    parser.add_argument('--stages', type=int, default=8, help='số stage mỗi roadmap')
+    parser.add_argument('--tasks', type=int, default=20, help='số task mỗi stage')
+    parser.add_argument('--seed', type=int, default=0, help='seed của random (kết quả lặp lại được)')
+
+def seed_from_args(args):
+    return seed(posts=args.posts, works=args.works, roadmaps=args.roadmaps,
+                stages=args.stages, tasks=args.tasks, random_seed=args.seed)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', help='file SQLite đích (mặc định DATABASE_URL / instance/blog.db)')
+    add_arguments(parser)
+    args = parser.parse_args()
+    if args.db:
+        os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.abspath(args.db)
+    from app import app
+    with app.app_context():
+        print(json.dumps(seed_from_args(args)))
+
+if __name__ == '__main__':
+    main()
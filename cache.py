@@ -0,0 +1,258 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import request, session, make_response
+from sqlalchemy import event
+
+
+class PageCache:
+    """Cache HTML đã render của các trang public.
+
+    Hai tầng: LRU trong bộ nhớ (giới hạn số trang và số byte) và tầng đĩa tùy
+    chọn (PAGE_CACHE_DIR) dùng chung giữa các worker gunicorn. Mỗi entry gắn
+    với một "generation"; mọi commit có ghi dữ liệu sẽ đổi generation nên các
+    entry cũ tự động hết hiệu lực, không cần biết trang nào phụ thuộc bảng nào.
+    Generation nằm trong một file nhỏ để mọi worker cùng thấy một giá trị.
+
+    Key chỉ gồm path và các query arg mà view đọc (QUERY_ARGS, giá trị số
+    nguyên); arg lạ không tạo entry mới. Tầng đĩa cũng có giới hạn số file
+    và số byte, file cũ nhất bị xóa trước.
+    """
+
+    QUERY_ARGS = ('before', 'after')
+    DISK_TRIM_EVERY = 32  # số lần ghi đĩa của một process giữa hai lần kiểm tra giới hạn
+
+    def __init__(self, app=None, db=None):
+        self.enabled = False
+        self.max_entries = 256
+        self.max_bytes = 32 * 1024 * 1024
+        self.directory = None
+        self.disk_max_entries = 4096
+        self.disk_max_bytes = 256 * 1024 * 1024
+        self._disk_writes = 0
+        self.generation_file = None
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (body, mimetype, etag)
+        self._bytes = 0
+        self._entries_gen = None
+        self._local_gen = 0
+        self._watching = False
+        self.stats = {'hits': 0, 'disk_hits': 0, 'misses': 0, 'bypass': 0, 'not_modified': 0, 'invalidations': 0}
+        if app is not None:
+            self.init_app(app, db)
+
+    def init_app(self, app, db):
+        self.enabled = app.config.get('PAGE_CACHE_ENABLED', True)
+        self.max_entries = app.config.get('PAGE_CACHE_MAX_ENTRIES', self.max_entries)
+        self.max_bytes = app.config.get('PAGE_CACHE_MAX_BYTES', self.max_bytes)
+        self.directory = app.config.get('PAGE_CACHE_DIR')
+        self.disk_max_entries = app.config.get('PAGE_CACHE_DISK_MAX_ENTRIES', self.disk_max_entries)
+        self.disk_max_bytes = app.config.get('PAGE_CACHE_DISK_MAX_BYTES', self.disk_max_bytes)
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+        self.generation_file = app.config.get('PAGE_CACHE_GENERATION_FILE') or os.path.join(
+            self.directory or app.instance_path, 'page_cache.generation')
+        os.makedirs(os.path.dirname(self.generation_file), exist_ok=True)
+        # db.session là scoped_session dùng chung mọi app: chỉ gắn listener một lần
+        if not self._watching:
+            self._watch_writes(db.session)
+            self._watching = True
+
+    # ---------------- generation ----------------
+    def generation(self):
+        try:
+            with open(self.generation_file) as f:
+                return f.read().strip() or '0'
+        except FileNotFoundError:
+            return '0'
+
+    def bump(self):
+        """Đổi generation: mọi trang đã cache trước đó coi như hết hạn."""
+        with self._lock:
+            self._local_gen += 1
+            self._entries.clear()
+            self._bytes = 0
+            self.stats['invalidations'] += 1
+        # giá trị duy nhất theo process để hai worker bump cùng lúc không ra cùng một generation
+        gen = f'{time.time_ns()}-{os.getpid()}-{self._local_gen}'
+        tmp = f'{self.generation_file}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp, 'w') as f:
+            f.write(gen)
+        os.replace(tmp, self.generation_file)
+        if self.directory:
+            for name in os.listdir(self.directory):
+                path = os.path.join(self.directory, name)
+                if name != gen and os.path.isdir(path):
+                    shutil.rmtree(path, ignore_errors=True)
+
+    def _watch_writes(self, db_session):
+        # đánh dấu session có ghi (flush hoặc UPDATE/DELETE hàng loạt), bump sau khi commit thành công
+        @event.listens_for(db_session, 'after_flush')
+        def _after_flush(s, flush_context):
+            if s.new or s.dirty or s.deleted:
+                s.info['content_changed'] = True
+
+        @event.listens_for(db_session, 'do_orm_execute')
+        def _on_execute(state):
+            if state.is_insert or state.is_update or state.is_delete:
+                state.session.info['content_changed'] = True
+
+        @event.listens_for(db_session, 'after_commit')
+        def _after_commit(s):
+            if s.info.pop('content_changed', False):
+                self.bump()
+
+        @event.listens_for(db_session, 'after_soft_rollback')
+        def _after_rollback(s, previous_transaction):
+            s.info.pop('content_changed', None)
+
+    # ---------------- storage ----------------
+    def _disk_path(self, gen, key):
+        return os.path.join(self.directory, gen, hashlib.sha1(key.encode()).hexdigest())
+
+    def get(self, gen, key):
+        with self._lock:
+            if self._entries_gen == gen and key in self._entries:
+                self._entries.move_to_end(key)
+                self.stats['hits'] += 1
+                return self._entries[key]
+        if self.directory:
+            try:
+                with open(self._disk_path(gen, key), 'rb') as f:
+                    meta = json.loads(f.readline())
+                    entry = (f.read(), meta['mimetype'], meta['etag'])
+            except (FileNotFoundError, ValueError, KeyError):
+                entry = None
+            if entry is not None:
+                self._remember(gen, key, entry)
+                with self._lock:
+                    self.stats['disk_hits'] += 1
+                return entry
+        with self._lock:
+            self.stats['misses'] += 1
+        return None
+
+    def _remember(self, gen, key, entry):
+        size = len(entry[0])
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if self._entries_gen != gen:
+                self._entries.clear()
+                self._bytes = 0
+                self._entries_gen = gen
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old[0])
+            self._entries[key] = entry
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted[0])
+
+    def set(self, gen, key, entry):
+        self._remember(gen, key, entry)
+        if self.directory:
+            path = self._disk_path(gen, key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            with open(tmp, 'wb') as f:
+                f.write(json.dumps({'mimetype': entry[1], 'etag': entry[2]}).encode() + b'\n')
+                f.write(entry[0])
+            os.replace(tmp, path)
+            with self._lock:
+                self._disk_writes += 1
+                trim = self._disk_writes % self.DISK_TRIM_EVERY == 1
+            if trim:
+                self._trim_disk(os.path.dirname(path))
+
+    def _trim_disk(self, folder):
+        """Xóa file cũ nhất (theo mtime) cho tới khi về dưới 90% giới hạn. Trả về số file đã xóa."""
+        files = []
+        try:
+            with os.scandir(folder) as it:
+                for e in it:
+                    if e.is_file() and not e.name.endswith('.tmp'):
+                        st = e.stat()
+                        files.append((st.st_mtime, st.st_size, e.path))
+        except FileNotFoundError:
+            return 0
+        total = sum(size for _, size, _ in files)
+        if len(files) <= self.disk_max_entries and total <= self.disk_max_bytes:
+            return 0
+        files.sort()
+        removed = 0
+        for _, size, path in files:
+            if len(files) - removed <= self.disk_max_entries * 0.9 and total <= self.disk_max_bytes * 0.9:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            removed += 1
+            total -= size
+        return removed
+
+    def key(self):
+        """Key của request hiện tại, None nếu arg có giá trị không hợp lệ (không cache)."""
+        parts = []
+        for name in self.QUERY_ARGS:
+            values = request.args.getlist(name)
+            if not values:
+                continue
+            try:
+                if len(values) > 1:
+                    return None
+                parts.append(f'{name}={int(values[0])}')
+            except ValueError:
+                return None
+        return request.path + ('?' + '&'.join(parts) if parts else '')
+
+    def info(self):
+        with self._lock:
+            return dict(self.stats, entries=len(self._entries), bytes=self._bytes,
+                        generation=self.generation(), disk=bool(self.directory))
+
+    # ---------------- view decorator ----------------
+    def cached(self, view):
+        """Cache response 200 của view GET; admin đăng nhập luôn đi thẳng vào view."""
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            key = self.key() if self.enabled and request.method == 'GET' and not session.get('admin') else None
+            if key is None:
+                with self._lock:
+                    self.stats['bypass'] += 1
+                return view(*args, **kwargs)
+
+            gen = self.generation()
+            entry = self.get(gen, key)
+            cache_status = 'HIT'
+            if entry is None:
+                cache_status = 'MISS'
+                resp = make_response(view(*args, **kwargs))
+                if resp.status_code != 200 or resp.direct_passthrough:
+                    return resp
+                body = resp.get_data()
+                entry = (body, resp.mimetype, hashlib.sha256(body).hexdigest()[:32])
+                self.set(gen, key, entry)
+
+            body, mimetype, etag = entry
+            resp = make_response(body)
+            resp.mimetype = mimetype
+            resp.set_etag(etag)
+            resp.headers['Cache-Control'] = 'no-cache'
+            resp.headers['X-Cache'] = cache_status
+            resp = resp.make_conditional(request)
+            if resp.status_code == 304:
+                with self._lock:
+                    self.stats['not_modified'] += 1
+            return resp
+        return wrapper
+
+
+page_cache = PageCache()
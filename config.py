@@ -0,0 +1,83 @@
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class Config:
+    SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL', 'sqlite:///blog.db')
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = {}
+    SECRET_KEY = os.getenv('SECRET_KEY', 'dev-secret-change-me')
+
+    PAGE_SIZE = int(os.getenv('PAGE_SIZE', 10))
+    ADMIN_PAGE_SIZE = int(os.getenv('ADMIN_PAGE_SIZE', 50))
+
+    PAGE_CACHE_ENABLED = os.getenv('PAGE_CACHE_ENABLED', '1') == '1'
+    PAGE_CACHE_MAX_ENTRIES = int(os.getenv('PAGE_CACHE_MAX_ENTRIES', 256))
+    PAGE_CACHE_DIR = os.getenv('PAGE_CACHE_DIR')  # tầng đĩa dùng chung giữa các worker
+    PAGE_CACHE_DISK_MAX_ENTRIES = int(os.getenv('PAGE_CACHE_DISK_MAX_ENTRIES', 4096))
+    PAGE_CACHE_DISK_MAX_BYTES = int(os.getenv('PAGE_CACHE_DISK_MAX_BYTES', 256 * 1024 * 1024))
+
+    # ảnh thu nhỏ của Work (images.py), lưu dưới static/WORK_IMAGE_DIR
+    WORK_IMAGE_DIR = 'works'
+    WORK_IMAGE_WIDTHS = (160, 320, 640)  # thẻ work hiển thị ~140-160px, 320/640 cho màn hình 2x-4x
+    WORK_IMAGE_MAX_BYTES = 20 * 1024 * 1024
+    WORK_IMAGE_TIMEOUT = 15
+    WORK_IMAGE_WORKERS = int(os.getenv('WORK_IMAGE_WORKERS', 2))
+
+    # url_for('static') trỏ tới file có hash trong static/dist (cần chạy `flask assets-build`)
+    ASSETS_FINGERPRINT = os.getenv('ASSETS_FINGERPRINT', '0') == '1'
+
+    # đo SQL/template mỗi request (instrumentation.py); tắt thì không gắn hook nào
+    INSTRUMENTATION = os.getenv('INSTRUMENTATION', '0') == '1'
+    INSTRUMENTATION_LOG = os.getenv('INSTRUMENTATION_LOG', '0') == '1'  # một dòng log JSON mỗi request
+    INSTRUMENTATION_SLOW_QUERIES = int(os.getenv('INSTRUMENTATION_SLOW_QUERIES', 3))
+
+    # stream SSE /roadmap/events: chu kỳ đọc progress_event và thời gian tối đa một kết nối.
+    # Mỗi stream giữ một thread (worker gthread, xem gunicorn.conf.py); MAX_STREAMS mỗi
+    # process phải nhỏ hơn GUNICORN_THREADS, stream vượt quá thì đóng ngay và client
+    # kết nối lại sau BUSY_RETRY giây.
+    ROADMAP_EVENTS_POLL = float(os.getenv('ROADMAP_EVENTS_POLL', 1.0))
+    ROADMAP_EVENTS_MAX_SECONDS = float(os.getenv('ROADMAP_EVENTS_MAX_SECONDS', 25))
+    ROADMAP_EVENTS_MAX_STREAMS = int(os.getenv('ROADMAP_EVENTS_MAX_STREAMS', 4))
+    ROADMAP_EVENTS_BUSY_RETRY = float(os.getenv('ROADMAP_EVENTS_BUSY_RETRY', 10))
+
+    # PRAGMA chạy trên mỗi connection SQLite mới (xem models.setup_sqlite)
+    SQLITE_PRAGMAS = {}
+    # BEGIN IMMEDIATE cho request ghi: lấy write lock ngay từ đầu transaction thay vì
+    # nâng cấp từ đọc lên ghi giữa chừng (dễ dính "database is locked" dưới WAL)
+    SQLITE_IMMEDIATE_WRITES = False
+    # route đánh dấu @read_only chạy trên connection mode=ro riêng
+    SQLITE_READONLY_ENGINE = False
+
+
+class DevelopmentConfig(Config):
+    pass
+
+
+class ProductionConfig(Config):
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        # SQLite mở connection rẻ nhưng PRAGMA chạy lại mỗi lần -> giữ pool nhỏ, tái sử dụng
+        'pool_size': int(os.getenv('DB_POOL_SIZE', 5)),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', 10)),
+        'pool_timeout': 30,
+        'connect_args': {'timeout': 30, 'check_same_thread': False},
+    }
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',          # reader không bị writer chặn
+        'synchronous': 'NORMAL',        # đủ an toàn với WAL, ít fsync hơn FULL
+        'busy_timeout': 5000,           # ms chờ lock trước khi báo lỗi
+        'mmap_size': 256 * 1024 * 1024,
+        'cache_size': -32000,           # âm = KiB -> ~32 MB page cache mỗi connection
+        'temp_store': 'MEMORY',
+    }
+    SQLITE_IMMEDIATE_WRITES = True
+    SQLITE_READONLY_ENGINE = True
+    ASSETS_FINGERPRINT = os.getenv('ASSETS_FINGERPRINT', '1') == '1'
+
+
+CONFIGS = {
+    'development': DevelopmentConfig,
+    'production': ProductionConfig,
+}
@@ -0,0 +1,64 @@
+import hashlib
+import html
+import re
+import markdown
+import nh3
+
+# Tăng khi đổi extension/cấu hình markdown hoặc danh sách tag được phép:
+# `flask posts-render` sẽ render lại các bài có render_version cũ.
+RENDERER_VERSION = 2
+
+EXCERPT_LENGTH = 300
+
+_MD_EXTENSIONS = ['fenced_code', 'codehilite', 'tables', 'toc', 'sane_lists']
+_MD_CONFIG = {
+    'codehilite': {'guess_lang': False, 'css_class': 'highlight'},
+}
+
+# heading cần id (anchor của mục lục), span/div cần class (màu của Pygments)
+_ALLOWED_ATTRIBUTES = {
+    **{f'h{i}': {'id'} for i in range(1, 7)},
+    'a': {'href', 'title'},
+    'img': {'src', 'alt', 'title', 'width', 'height'},
+    'span': {'class'},
+    'div': {'class'},
+    'code': {'class'},
+    'th': {'align'},
+    'td': {'align'},
+}
+
+
+def content_hash(source):
+    return hashlib.sha256((source or '').encode('utf-8')).hexdigest()
+
+def _flatten_toc(tokens):
+    items = []
+    for t in tokens:
+        # name của extension toc đã escape sẵn; lưu text thô để Jinja escape một lần
+        items.append({'level': t['level'], 'id': t['id'], 'name': html.unescape(t['name'])})
+        items.extend(_flatten_toc(t['children']))
+    return items
+
+def _excerpt(safe_html, length=EXCERPT_LENGTH):
+    text = html.unescape(nh3.clean(safe_html, tags=set()))
+    text = ' '.join(text.split())
+    if len(text) <= length:
+        return text
+    return re.sub(r'\s+\S*$', '', text[:length]) + '…'
+
+def render_markdown(source):
+    """Markdown -> HTML đã lọc XSS, kèm mục lục và đoạn trích.
+
+    Trả về dict: html, toc (list {level, id, name}), excerpt, hash, version.
+    Hàm thuần (không đụng DB) để chạy được trong process pool.
+    """
+    md = markdown.Markdown(extensions=_MD_EXTENSIONS, extension_configs=_MD_CONFIG)
+    raw = md.convert(source or '')
+    safe = nh3.clean(raw, attributes=_ALLOWED_ATTRIBUTES, url_schemes={'http', 'https', 'mailto'})
+    return {
+        'html': safe,
+        'toc': _flatten_toc(md.toc_tokens),
+        'excerpt': _excerpt(safe),
+        'hash': content_hash(source),
+        'version': RENDERER_VERSION,
+    }
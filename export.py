@@ -0,0 +1,230 @@
+"""Xuất các trang public ra file HTML tĩnh (flask export-static <dir>).
+
+Trang được render qua test client của chính app nên giống hệt trang động.
+URL nội bộ được viết lại sang dạng thư mục (/post/5 -> /post/5/, file
+post/5/index.html); trang phân trang dùng /blog/page/<n>/. URL không được
+xuất (tag, search, toggle, /api...) giữ nguyên để nginx chuyển về Flask
+(try_files $uri $uri/ @flask).
+
+Mỗi trang có một hash tính từ các dòng Post/Work/Roadmap tạo nên nó cùng
+với dấu vân tay của templates/ và manifest asset. Hash được lưu trong
+.export-manifest.json; lần chạy sau chỉ render lại trang có hash đổi.
+"""
+import hashlib
+import html
+import json
+import os
+import re
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from models import db, Post, Work, Roadmap, ProgressEvent
+from content import RENDERER_VERSION
+from assets import assets
+
+MANIFEST = '.export-manifest.json'
+POST_LIST_FIELDS = (Post.id, Post.title, Post.date, Post.tags, Post.desc, Post.excerpt)
+POST_FIELDS = POST_LIST_FIELDS + (Post.content_hash, Post.render_version)
+# image_source/image_variants: thẻ <picture> đổi khi ảnh thu nhỏ sinh xong ở nền
+WORK_FIELDS = (Work.id, Work.title, Work.year, Work.category, Work.desc, Work.image,
+               Work.image_source, Work.image_variants)
+
+_LINK = re.compile(r'\b(href|src|action)="(/[^"]*)"')
+_EXPORTED_PATH = re.compile(r'^/(?:blog|works|roadmap|post/\d+)$')
+
+
+# ---------------- URL ----------------
+def output_path(url):
+    """'/' -> 'index.html', '/post/5/' -> 'post/5/index.html'."""
+    return os.path.join(url.strip('/'), 'index.html') if url.strip('/') else 'index.html'
+
+def rewrite_links(page_html, url_map):
+    """Đổi link nội bộ sang URL tĩnh: theo url_map (trang phân trang) hoặc thêm '/' cuối."""
+    def sub(m):
+        url = html.unescape(m.group(2))
+        target = url_map.get(url)
+        if target is None and _EXPORTED_PATH.match(url):
+            target = url + '/'
+        return m.group(0) if target is None else f'{m.group(1)}="{html.escape(target)}"'
+    return _LINK.sub(sub, page_html)
+
+
+# ---------------- Plan ----------------
+def _fingerprint(app, extra):
+    """Hash của templates/, manifest asset (nếu bật fingerprint) và cấu hình ảnh hưởng tới HTML.
+
+    Đổi là render lại mọi trang. Nội dung file trong static/ không nằm trong
+    HTML (chỉ URL của chúng) nên không tính; ảnh thu nhỏ static/works/ đi
+    theo cột của Work trong hash từng trang.
+    """
+    h = hashlib.sha256(repr(extra).encode())
+    root = os.path.join(app.root_path, app.template_folder)
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in sorted(filenames):
+            path = os.path.join(dirpath, name)
+            h.update(os.path.relpath(path, root).encode())
+            with open(path, 'rb') as f:
+                h.update(hashlib.sha256(f.read()).digest())
+    if app.config.get('ASSETS_FINGERPRINT'):
+        # url_for('static') trả về tên có hash theo manifest
+        h.update(repr(sorted(assets.load_manifest().items())).encode())
+    return h.hexdigest()
+
+def _digest(fingerprint, *parts):
+    return hashlib.sha256((fingerprint + repr(parts)).encode()).hexdigest()
+
+def _paginate(prefix, rows, per_page, fingerprint, url_map):
+    """Các trang danh sách theo keyset giống keyset_page: (url động, url tĩnh, hash)."""
+    pages = []
+    chunks = [rows[i:i + per_page] for i in range(0, len(rows), per_page)] or [[]]
+    for n, chunk in enumerate(chunks, start=1):
+        static_url = f'/{prefix}/' if n == 1 else f'/{prefix}/page/{n}/'
+        dynamic_url = f'/{prefix}' if n == 1 else f'/{prefix}?before={chunks[n - 2][-1][0]}'
+        url_map[dynamic_url] = static_url
+        if n > 1:
+            # link "Newer" của trang n là ?after=<id đầu trang n>, chính là trang n-1
+            url_map[f'/{prefix}?after={chunk[0][0]}'] = pages[-1][1]
+        pages.append((dynamic_url, static_url, _digest(fingerprint, prefix, n, len(chunks), chunk)))
+    return pages
+
+def plan_pages(app):
+    """Danh sách (url động, url tĩnh, hash) của mọi trang cần xuất và url_map cho rewrite_links."""
+    per_page = app.config['PAGE_SIZE']
+    fingerprint = _fingerprint(app, (per_page, RENDERER_VERSION))
+    url_map = {'/': '/'}
+
+    posts = [tuple(r) for r in db.session.query(*POST_FIELDS).order_by(Post.id.desc())]
+    works = [tuple(r) for r in db.session.query(*WORK_FIELDS).order_by(Work.id.desc())]
+    list_rows = [p[:len(POST_LIST_FIELDS)] for p in posts]
+
+    pages = [('/', '/', _digest(fingerprint, 'home', list_rows[:3], works[:3]))]
+    pages += _paginate('blog', list_rows, per_page, fingerprint, url_map)
+    pages += [(f'/post/{p[0]}', f'/post/{p[0]}/', _digest(fingerprint, 'post', p)) for p in posts]
+    pages += _paginate('works', works, per_page, fingerprint, url_map)
+
+    # trang roadmap chỉ còn tóm tắt; stages/tasks tải qua API (nginx chuyển về Flask)
+    roadmap_rows = (
+        [tuple(r) for r in db.session.query(Roadmap.id, Roadmap.title, Roadmap.description,
+                                            Roadmap.task_done, Roadmap.task_total).order_by(Roadmap.id)],
+        db.session.query(db.func.max(ProgressEvent.id)).scalar(),
+    )
+    pages.append(('/roadmap', '/roadmap/', _digest(fingerprint, 'roadmap', roadmap_rows)))
+    return pages, url_map
+
+
+# ---------------- Render (worker) ----------------
+_worker = {}
+
+def _init_worker(out_dir, url_map):
+    from app import app
+    from cache import page_cache
+    # connection SQLite không dùng chung qua fork; page cache vô ích khi mỗi trang chỉ render một lần
+    with app.app_context():
+        db.engine.dispose()
+        readonly = app.extensions.get('sqlite_readonly_engine')
+        if readonly is not None:
+            readonly.dispose()
+    page_cache.enabled = False
+    _worker.update(client=app.test_client(), out_dir=out_dir, url_map=url_map)
+
+def _render_page(job):
+    dynamic_url, static_url = job
+    resp = _worker['client'].get(dynamic_url)
+    if resp.status_code != 200:
+        return static_url, f'HTTP {resp.status_code}'
+    page_html = rewrite_links(resp.get_data(as_text=True), _worker['url_map'])
+    path = os.path.join(_worker['out_dir'], output_path(static_url))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(page_html)
+    os.replace(tmp, path)
+    return static_url, None
+
+
+# ---------------- Export ----------------
+def _copy_static(src, dst):
+    """Chép static/ sang dst, bỏ qua file đã có cùng kích thước và mtime. Trả về số file đã chép."""
+    copied = 0
+    for dirpath, _, filenames in os.walk(src):
+        target_dir = os.path.join(dst, os.path.relpath(dirpath, src))
+        os.makedirs(target_dir, exist_ok=True)
+        for name in filenames:
+            source, target = os.path.join(dirpath, name), os.path.join(target_dir, name)
+            st = os.stat(source)
+            try:
+                tt = os.stat(target)
+                if tt.st_size == st.st_size and int(tt.st_mtime) == int(st.st_mtime):
+                    continue
+            except FileNotFoundError:
+                pass
+            shutil.copy2(source, target)
+            copied += 1
+    return copied
+
+def _load_manifest(out_dir):
+    try:
+        with open(os.path.join(out_dir, MANIFEST)) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+def _remove_page(out_dir, static_url):
+    path = os.path.join(out_dir, output_path(static_url))
+    if os.path.exists(path):
+        os.remove(path)
+    folder = os.path.dirname(path)
+    while folder != out_dir.rstrip(os.sep) and os.path.isdir(folder) and not os.listdir(folder):
+        os.rmdir(folder)
+        folder = os.path.dirname(folder)
+
+def export_site(app, out_dir, workers=None, force=False, log=None):
+    """Xuất site vào out_dir (cần app context). Trả về dict rebuilt/skipped/removed/failed/static/seconds."""
+    started = time.perf_counter()
+    out_dir = os.path.abspath(out_dir)
+    os.makedirs(out_dir, exist_ok=True)
+    old = {} if force else _load_manifest(out_dir)
+    pages, url_map = plan_pages(app)
+
+    manifest = {}
+    jobs = []
+    for dynamic_url, static_url, digest in pages:
+        manifest[static_url] = digest
+        if old.get(static_url) == digest and os.path.exists(os.path.join(out_dir, output_path(static_url))):
+            continue
+        jobs.append((dynamic_url, static_url))
+
+    removed = [url for url in old if url not in manifest]
+    for static_url in removed:
+        _remove_page(out_dir, static_url)
+
+    failed = []
+    if jobs:
+        # giải phóng connection của process cha trước khi fork worker
+        db.session.remove()
+        db.engine.dispose()
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(out_dir, url_map)) as pool:
+            for static_url, error in pool.map(_render_page, jobs, chunksize=32):
+                if error:
+                    failed.append((static_url, error))
+                    manifest.pop(static_url, None)
+                    if log:
+                        log(f'  lỗi {static_url}: {error}')
+
+    static_copied = _copy_static(app.static_folder, os.path.join(out_dir, app.static_url_path.strip('/')))
+    tmp = os.path.join(out_dir, MANIFEST + '.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f, indent=0, sort_keys=True)
+    os.replace(tmp, os.path.join(out_dir, MANIFEST))
+    return {
+        'pages': len(pages),
+        'rebuilt': len(jobs) - len(failed),
+        'skipped': len(pages) - len(jobs),
+        'removed': len(removed),
+        'failed': len(failed),
+        'static': static_copied,
+        'seconds': round(time.perf_counter() - started, 2),
+    }
@@ -0,0 +1,25 @@
+# Chạy: APP_CONFIG=production gunicorn app:app
+# (gunicorn tự đọc file này khi nằm ở thư mục hiện tại)
+import multiprocessing
+import os
+
+bind = os.getenv('GUNICORN_BIND', '127.0.0.1:8000')
+workers = int(os.getenv('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+# gthread: stream SSE /roadmap/events giữ một thread chứ không giữ cả worker;
+# ROADMAP_EVENTS_MAX_STREAMS (mặc định 4) luôn để lại thread cho request thường
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.getenv('GUNICORN_THREADS', 8))
+timeout = 30
+# import app (và chạy migration) một lần ở master rồi mới fork
+preload_app = True
+
+
+def post_fork(server, worker):
+    # connection SQLite không được dùng chung giữa các process
+    from app import app
+    from models import db
+    with app.app_context():
+        db.engine.dispose()
+        readonly = app.extensions.get('sqlite_readonly_engine')
+        if readonly is not None:
+            readonly.dispose()
@@ -0,0 +1,140 @@
+"""Ảnh thu nhỏ WebP/JPEG cho Work.image.
+
+Khi admin lưu một work, schedule() đẩy việc resize vào thread pool nền nên
+request không phải chờ. Ảnh nguồn là file trong static/ (/static/...) hoặc
+URL http(s). Các bản thu nhỏ nằm ở static/<WORK_IMAGE_DIR>/<work id>/ và
+được ghi vào Work.image_variants; template dùng chúng cho srcset.
+"""
+import hashlib
+import io
+import json
+import os
+import shutil
+import threading
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+from PIL import Image, ImageOps
+
+from models import db, Work
+
+FORMATS = (
+    ('webp', '.webp', {'format': 'WEBP', 'quality': 80, 'method': 6}),
+    ('jpeg', '.jpg', {'format': 'JPEG', 'quality': 82, 'optimize': True, 'progressive': True}),
+)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _read_source(app, image):
+    """Bytes của ảnh nguồn, None nếu không đọc được từ static/ hay http(s)."""
+    url = urlparse(image)
+    max_bytes = app.config['WORK_IMAGE_MAX_BYTES']
+    if url.scheme in ('http', 'https'):
+        req = urllib.request.Request(image, headers={'User-Agent': 'blog-thumbnailer'})
+        try:
+            with urllib.request.urlopen(req, timeout=app.config['WORK_IMAGE_TIMEOUT']) as resp:
+                data = resp.read(max_bytes + 1)
+        except (OSError, ValueError):
+            return None
+        return data if len(data) <= max_bytes else None
+    prefix = app.static_url_path.rstrip('/') + '/'
+    if not url.scheme and url.path.startswith(prefix):
+        root = os.path.realpath(app.static_folder)
+        path = os.path.realpath(os.path.join(root, url.path[len(prefix):]))
+        if path.startswith(root + os.sep) and os.path.isfile(path) and os.path.getsize(path) <= max_bytes:
+            with open(path, 'rb') as f:
+                return f.read()
+    return None
+
+def make_variants(data, widths):
+    """Resize ảnh thành các bản WebP/JPEG theo từng chiều rộng (không phóng to).
+
+    Trả về list (format, ext, width, height, bytes).
+    """
+    with Image.open(io.BytesIO(data)) as img:
+        img = ImageOps.exif_transpose(img)
+        has_alpha = img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info)
+        img = img.convert('RGBA' if has_alpha else 'RGB')
+        targets = sorted({min(w, img.width) for w in widths})
+        out = []
+        for width in targets:
+            height = max(1, round(img.height * width / img.width))
+            resized = img.resize((width, height), Image.LANCZOS) if width != img.width else img
+            for fmt, ext, options in FORMATS:
+                frame = resized
+                if fmt == 'jpeg' and has_alpha:
+                    frame = Image.new('RGB', resized.size, 'white')
+                    frame.paste(resized, mask=resized.getchannel('A'))
+                buf = io.BytesIO()
+                frame.save(buf, **options)
+                out.append((fmt, ext, width, height, buf.getvalue()))
+        return out
+
+def generate(app, work_id):
+    """Sinh ảnh thu nhỏ cho một work (cần app context). Trả về số file đã ghi."""
+    work = db.session.get(Work, work_id)
+    if work is None or not work.image:
+        return 0
+    source = work.image
+    data = _read_source(app, source)
+    if data is None:
+        app.logger.warning('work %s: không đọc được ảnh %s', work_id, source)
+        return 0
+
+    try:
+        resized = make_variants(data, app.config['WORK_IMAGE_WIDTHS'])
+    except (OSError, Image.DecompressionBombError):
+        app.logger.warning('work %s: %s không phải ảnh hợp lệ', work_id, source)
+        return 0
+
+    folder = os.path.join(app.config['WORK_IMAGE_DIR'], str(work_id))
+    abs_folder = os.path.join(app.static_folder, folder)
+    os.makedirs(abs_folder, exist_ok=True)
+    stem = hashlib.sha256(data).hexdigest()[:12]
+    variants = {fmt: [] for fmt, _, _ in FORMATS}
+    keep = set()
+    for fmt, ext, width, height, blob in resized:
+        name = f'{stem}-{width}{ext}'
+        keep.add(name)
+        with open(os.path.join(abs_folder, name), 'wb') as f:
+            f.write(blob)
+        variants[fmt].append([f'{folder}/{name}'.replace(os.sep, '/'), width, height])
+
+    smallest = variants['jpeg'][0]
+    # chỉ ghi nếu image chưa bị đổi tiếp trong lúc đang resize
+    updated = db.session.execute(
+        db.update(Work)
+        .where(Work.id == work_id, Work.image == source)
+        .values(image_source=source, image_variants=json.dumps(variants),
+                image_width=smallest[1], image_height=smallest[2])
+        .execution_options(synchronize_session=False)).rowcount
+    db.session.commit()
+    if updated:
+        for name in os.listdir(abs_folder):
+            if name not in keep:
+                os.remove(os.path.join(abs_folder, name))
+    return len(keep)
+
+def remove(app, work_id):
+    shutil.rmtree(os.path.join(app.static_folder, app.config['WORK_IMAGE_DIR'], str(work_id)), ignore_errors=True)
+
+
+def _run(app, work_id):
+    with app.app_context():
+        try:
+            generate(app, work_id)
+        except Exception:
+            app.logger.exception('work %s: lỗi khi sinh ảnh thu nhỏ', work_id)
+            db.session.rollback()
+
+def schedule(app, work_id):
+    """Sinh ảnh thu nhỏ ở thread nền. Pool tạo lúc cần nên mỗi worker gunicorn có pool riêng."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=app.config['WORK_IMAGE_WORKERS'],
+                                           thread_name_prefix='work-images')
+    return _executor.submit(_run, app, work_id)
@@ -0,0 +1,193 @@
+import bisect
+import json
+import logging
+import threading
+import time
+from flask import current_app, g, request, has_request_context, before_render_template, template_rendered
+from sqlalchemy import event
+
+# ranh giới bucket của histogram (ms); bucket cuối là > 5000
+BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+SLOW_STATEMENT_CHARS = 300
+
+
+class _Histogram:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+        self.buckets[bisect.bisect_left(BUCKETS_MS, value)] += 1
+
+    def quantile(self, q):
+        """Ước lượng theo bucket: trả về cận trên của bucket chứa phân vị q."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(BUCKETS_MS, self.buckets):
+            seen += n
+            if seen >= rank:
+                return bound
+        return round(self.max, 2)
+
+    def to_dict(self):
+        labels = [f'<={b}' for b in BUCKETS_MS] + [f'>{BUCKETS_MS[-1]}']
+        return {
+            'count': self.count,
+            'avg': round(self.total / self.count, 2) if self.count else None,
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'max': round(self.max, 2),
+            'buckets': {label: n for label, n in zip(labels, self.buckets) if n},
+        }
+
+
+class Instrumentation:
+    """Đo thời gian SQL và render template của từng request.
+
+    Bật bằng INSTRUMENTATION=1. Khi tắt, init_app không gắn listener hay
+    hook nào nên không tốn gì. Khi bật, mỗi response có header
+    Server-Timing (db, tpl, app), tùy chọn một dòng log JSON
+    (INSTRUMENTATION_LOG), và histogram theo route được cộng dồn trong
+    process để /admin/metrics đọc (mỗi worker gunicorn có số liệu riêng).
+    """
+
+    def __init__(self, app=None, db=None):
+        self.enabled = False
+        self.log = False
+        self.slow_queries = 3
+        self._lock = threading.Lock()
+        self._routes = {}  # endpoint -> dict histogram
+        self._slowest = []  # [(ms, endpoint, statement)] chậm nhất toàn process
+        if app is not None:
+            self.init_app(app, db)
+
+    def init_app(self, app, db):
+        """Gắn hook vào app và engine (gọi trong app context, sau setup_sqlite)."""
+        self.enabled = app.config.get('INSTRUMENTATION', False)
+        if not self.enabled:
+            return
+        self.log = app.config.get('INSTRUMENTATION_LOG', False)
+        self.slow_queries = app.config.get('INSTRUMENTATION_SLOW_QUERIES', self.slow_queries)
+
+        engines = [db.engine]
+        readonly = app.extensions.get('sqlite_readonly_engine')
+        if readonly is not None:
+            engines.append(readonly)
+        for engine in engines:
+            if event.contains(engine, 'before_cursor_execute', self._before_execute):
+                continue  # init_app lần hai trên cùng engine không đếm query hai lần
+            event.listen(engine, 'before_cursor_execute', self._before_execute)
+            event.listen(engine, 'after_cursor_execute', self._after_execute)
+        before_render_template.connect(self._before_render, app)
+        template_rendered.connect(self._after_render, app)
+        app.before_request(self._start)
+        app.after_request(self._finish)
+
+    # ---------------- per request ----------------
+    def _start(self):
+        g.metrics = {
+            'started': time.perf_counter(),
+            'queries': 0,
+            'sql_ms': 0.0,
+            'slow': [],
+            'template_ms': 0.0,
+            'template_started': None,
+        }
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info['query_started'] = time.perf_counter()
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = (time.perf_counter() - conn.info.pop('query_started', time.perf_counter())) * 1000
+        if not has_request_context():
+            return
+        m = g.get('metrics')
+        if m is None:
+            return
+        m['queries'] += 1
+        m['sql_ms'] += elapsed
+        slow = m['slow']
+        if len(slow) < self.slow_queries or elapsed > slow[-1][0]:
+            slow.append((elapsed, statement))
+            slow.sort(key=lambda s: -s[0])
+            del slow[self.slow_queries:]
+
+    def _before_render(self, sender, template, context, **extra):
+        m = g.get('metrics')
+        if m is not None:
+            m['template_started'] = time.perf_counter()
+
+    def _after_render(self, sender, template, context, **extra):
+        m = g.get('metrics')
+        if m is not None and m['template_started'] is not None:
+            m['template_ms'] += (time.perf_counter() - m['template_started']) * 1000
+            m['template_started'] = None
+
+    def _finish(self, response):
+        m = g.pop('metrics', None)
+        if m is None:
+            return response
+        total_ms = (time.perf_counter() - m['started']) * 1000
+        # render template có thể chứa query lazy-load nên tpl và db có thể chồng nhau
+        response.headers.add('Server-Timing', f'db;dur={m["sql_ms"]:.2f};desc="{m["queries"]} queries"')
+        response.headers.add('Server-Timing', f'tpl;dur={m["template_ms"]:.2f}')
+        response.headers.add('Server-Timing', f'app;dur={total_ms:.2f}')
+
+        endpoint = request.endpoint or 'unknown'
+        self._record(endpoint, total_ms, m)
+        if self.log and current_app.logger.isEnabledFor(logging.INFO):
+            current_app.logger.info(json.dumps({
+                'event': 'request',
+                'method': request.method,
+                'path': request.path,
+                'endpoint': endpoint,
+                'status': response.status_code,
+                'total_ms': round(total_ms, 2),
+                'sql_ms': round(m['sql_ms'], 2),
+                'queries': m['queries'],
+                'template_ms': round(m['template_ms'], 2),
+                'slowest': [{'ms': round(ms, 2), 'sql': sql[:SLOW_STATEMENT_CHARS]} for ms, sql in m['slow']],
+            }, ensure_ascii=False))
+        return response
+
+    # ---------------- aggregate ----------------
+    def _record(self, endpoint, total_ms, m):
+        with self._lock:
+            route = self._routes.get(endpoint)
+            if route is None:
+                route = self._routes[endpoint] = {
+                    'total_ms': _Histogram(), 'sql_ms': _Histogram(),
+                    'template_ms': _Histogram(), 'queries': _Histogram(),
+                }
+            route['total_ms'].add(total_ms)
+            route['sql_ms'].add(m['sql_ms'])
+            route['template_ms'].add(m['template_ms'])
+            route['queries'].add(m['queries'])
+            for ms, sql in m['slow']:
+                if len(self._slowest) < 20 or ms > self._slowest[-1][0]:
+                    self._slowest.append((ms, endpoint, sql[:SLOW_STATEMENT_CHARS]))
+                    self._slowest.sort(key=lambda s: -s[0])
+                    del self._slowest[20:]
+
+    def info(self):
+        if not self.enabled:
+            return {'enabled': False}
+        with self._lock:
+            return {
+                'enabled': True,
+                'bucket_bounds_ms': list(BUCKETS_MS),
+                'routes': {endpoint: {name: h.to_dict() for name, h in route.items()}
+                           for endpoint, route in sorted(self._routes.items())},
+                'slowest_statements': [{'ms': round(ms, 2), 'endpoint': endpoint, 'sql': sql}
+                                       for ms, endpoint, sql in self._slowest],
+            }
+
+
+instrumentation = Instrumentation()
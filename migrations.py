@@ -0,0 +1,210 @@
+"""Migration có đánh số phiên bản cho blog.db.
+
+db.create_all() chỉ tạo bảng còn thiếu, không thêm được cột hay index vào
+DB đã có. Mỗi migration ở đây chạy đúng một lần theo thứ tự; phiên bản đã
+áp dụng được ghi vào bảng schema_version. Các bước đều idempotent (kiểm tra
+cột/index trước khi tạo) nên DB mới tạo bằng create_all cũng đi qua an toàn.
+"""
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from sqlalchemy import text
+from sqlalchemy.orm import load_only, selectinload
+from models import db, Post, Tag, ProgressEvent, parse_tags, prune_tags
+from content import render_markdown, RENDERER_VERSION
+from progress import rebuild_counters
+import search
+
+
+# ---------------- Data migrations ----------------
+def migrate_tags():
+    """Điền bảng tag/post_tag từ cột Post.tags của mọi bài viết. Trả về số bài đã xử lý."""
+    posts = Post.query.options(load_only(Post.id, Post.tags), selectinload(Post.tag_list)).all()
+    tags = {t.name: t for t in Tag.query}
+    for p in posts:
+        names = parse_tags(p.tags)
+        for name in names:
+            if name not in tags:
+                tags[name] = Tag(name=name)
+        p.tag_list = [tags[name] for name in names]
+    prune_tags()
+    db.session.commit()
+    return len(posts)
+
+def render_posts(force=False, workers=None, chunk_size=200):
+    """Render lại Markdown của các bài có render_version cũ (hoặc tất cả nếu force).
+
+    Render song song trên nhiều process, ghi từng chunk bằng một bulk UPDATE.
+    Trả về số bài đã render.
+    """
+    q = db.session.query(Post.id).order_by(Post.id)
+    if not force:
+        q = q.filter(db.or_(Post.render_version.is_(None), Post.render_version != RENDERER_VERSION))
+    ids = [pid for (pid,) in q]
+    if not ids:
+        return 0
+
+    pool = ProcessPoolExecutor(max_workers=workers) if workers != 1 and len(ids) > chunk_size else None
+    try:
+        for start in range(0, len(ids), chunk_size):
+            rows = db.session.query(Post.id, Post.content).filter(Post.id.in_(ids[start:start + chunk_size])).all()
+            sources = [content for _, content in rows]
+            rendered = pool.map(render_markdown, sources, chunksize=16) if pool else map(render_markdown, sources)
+            db.session.execute(db.update(Post), [{
+                'id': pid,
+                'content_html': r['html'],
+                'content_toc': json.dumps(r['toc'], ensure_ascii=False),
+                'excerpt': r['excerpt'],
+                'content_hash': r['hash'],
+                'render_version': r['version'],
+            } for (pid, _), r in zip(rows, rendered)])
+            db.session.commit()
+    finally:
+        if pool:
+            pool.shutdown()
+    return len(ids)
+
+
+# ---------------- Helpers ----------------
+def _columns(table):
+    return {row[1] for row in db.session.execute(text(f'PRAGMA table_info("{table}")'))}
+
+def _add_columns(table, columns):
+    existing = _columns(table)
+    for name, ddl in columns:
+        if name not in existing:
+            db.session.execute(text(f'ALTER TABLE "{table}" ADD COLUMN "{name}" {ddl}'))
+
+
+# ---------------- Migrations ----------------
+def _initial_schema():
+    db.create_all()
+
+def _task_counters():
+    for table in ('roadmap', 'stage'):
+        _add_columns(table, [
+            ('task_total', 'INTEGER NOT NULL DEFAULT 0'),
+            ('task_done', 'INTEGER NOT NULL DEFAULT 0'),
+        ])
+    db.session.commit()
+    rebuild_counters()
+
+def _post_search_index():
+    search.rebuild_index()
+
+def _post_tags():
+    migrate_tags()
+
+def _rendered_content():
+    _add_columns('post', [
+        ('content_html', 'TEXT'),
+        ('content_hash', 'VARCHAR(64)'),
+        ('content_toc', 'TEXT'),
+        ('excerpt', "TEXT DEFAULT ''"),
+        ('render_version', 'INTEGER'),
+    ])
+    db.session.commit()
+    render_posts()
+
+# Index khai báo trong __table_args__ của models; DB cũ cần tạo bằng tay.
+INDEXES = [
+    ('ix_stage_roadmap_order', 'stage', ('roadmap_id', 'order')),
+    ('ix_task_stage_done', 'task', ('stage_id', 'is_done')),
+    ('ix_task_stage_order', 'task', ('stage_id', 'order')),
+]
+
+def _indexes():
+    for name, table, columns in INDEXES:
+        cols = ', '.join(f'"{c}"' for c in columns)
+        db.session.execute(text(f'CREATE INDEX IF NOT EXISTS {name} ON "{table}" ({cols})'))
+    db.session.execute(text('ANALYZE'))
+
+def _work_image_variants():
+    _add_columns('work', [
+        ('image_source', 'VARCHAR(255)'),
+        ('image_variants', 'TEXT'),
+        ('image_width', 'INTEGER'),
+        ('image_height', 'INTEGER'),
+    ])
+    db.session.commit()
+
+def _progress_events():
+    ProgressEvent.__table__.create(db.session.connection(), checkfirst=True)
+    db.session.commit()
+
+MIGRATIONS = [
+    (1, 'initial schema', _initial_schema),
+    (2, 'stage/roadmap task counters', _task_counters),
+    (3, 'post_fts full-text index', _post_search_index),
+    (4, 'tag and post_tag tables', _post_tags),
+    (5, 'pre-rendered markdown columns', _rendered_content),
+    (6, 'indexes on stage/task foreign keys and order', _indexes),
+    (7, 'work image derivative columns', _work_image_variants),
+    (8, 'progress_event table', _progress_events),
+]
+
+
+def current_version():
+    db.session.execute(text(
+        'CREATE TABLE IF NOT EXISTS schema_version ('
+        'version INTEGER PRIMARY KEY, description TEXT, applied_at TEXT, duration_ms INTEGER)'))
+    return db.session.execute(text('SELECT coalesce(max(version), 0) FROM schema_version')).scalar()
+
+def run_migrations(log=None):
+    """Áp dụng các migration chưa chạy. Trả về list (version, description) đã áp dụng."""
+    applied = []
+    version = current_version()
+    db.session.commit()
+    for number, description, step in MIGRATIONS:
+        if number <= version:
+            continue
+        started = time.perf_counter()
+        step()
+        duration_ms = int((time.perf_counter() - started) * 1000)
+        db.session.execute(
+            text('INSERT INTO schema_version (version, description, applied_at, duration_ms) '
+                 'VALUES (:v, :d, :t, :ms)'),
+            {'v': number, 'd': description, 't': datetime.utcnow().isoformat(timespec='seconds'), 'ms': duration_ms})
+        db.session.commit()
+        applied.append((number, description))
+        if log:
+            log(f'migration {number}: {description} ({duration_ms} ms)')
+    return applied
+
+
+# ---------------- Query plans ----------------
+# Các query nóng của app (đúng cột/điều kiện như view đang chạy), tham số lấy id
+# nhỏ nhất để chạy được trên mọi DB; event_id là event mới nhất như một lần poll SSE.
+HOT_QUERIES = {
+    'roadmap_list / api_roadmaps': 'SELECT id, title, description, task_done, task_total FROM roadmap ORDER BY id',
+    'api_roadmap_detail stages': ('SELECT id, title, description, task_done, task_total FROM stage '
+                                  'WHERE roadmap_id = :rid ORDER BY "order"'),
+    'api_roadmap_detail tasks': ('SELECT id, stage_id, title, is_done FROM task '
+                                 'WHERE stage_id IN (:sid) ORDER BY stage_id, id'),
+    'latest_event_id': 'SELECT max(id) FROM progress_event',
+    'events_since (SSE poll)': ('SELECT id, payload FROM progress_event WHERE id > :event_id '
+                                'ORDER BY id LIMIT 100'),
+    'admin_stages': 'SELECT * FROM stage WHERE roadmap_id = :rid ORDER BY "order"',
+    'admin_tasks': 'SELECT * FROM task WHERE stage_id = :sid ORDER BY "order"',
+    'progress_counts': ('SELECT stage.roadmap_id, stage.id, count(task.id), '
+                        'coalesce(sum(CASE WHEN task.is_done = 1 THEN 1 ELSE 0 END), 0) '
+                        'FROM stage LEFT OUTER JOIN task ON task.stage_id = stage.id '
+                        'GROUP BY stage.roadmap_id, stage.id'),
+}
+
+def explain_hot_queries(repeat=20):
+    """[(tên, các dòng EXPLAIN QUERY PLAN, thời gian trung bình ms)] cho HOT_QUERIES."""
+    params = {
+        'rid': db.session.execute(text('SELECT coalesce(min(id), 0) FROM roadmap')).scalar(),
+        'sid': db.session.execute(text('SELECT coalesce(min(id), 0) FROM stage')).scalar(),
+        'event_id': db.session.execute(text('SELECT coalesce(max(id), 0) FROM progress_event')).scalar(),
+    }
+    report = []
+    for name, sql in HOT_QUERIES.items():
+        plan = [row[-1] for row in db.session.execute(text('EXPLAIN QUERY PLAN ' + sql), params)]
+        started = time.perf_counter()
+        for _ in range(repeat):
+            db.session.execute(text(sql), params).all()
+        report.append((name, plan, (time.perf_counter() - started) * 1000 / repeat))
+    return report
@@ -1,7 +1,121 @@
+import json
+from functools import wraps
+from flask import current_app, g, has_app_context, has_request_context, request
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine, event
 from datetime import datetime
+from content import render_markdown, content_hash, RENDERER_VERSION
 
-db = SQLAlchemy()
+
+class RoutingSession(Session):
+    """Session chuyển query của route @read_only sang engine SQLite mode=ro.
+
+    Flush (ghi) luôn đi qua engine chính.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and has_app_context() and g.get('read_only_db'):
+            engine = current_app.extensions.get('sqlite_readonly_engine')
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+
+def read_only(view):
+    """Đánh dấu view chỉ đọc: query chạy trên connection read-only nếu được bật."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g.read_only_db = True
+        return view(*args, **kwargs)
+    return wrapper
+
+def _apply_pragmas(dbapi_conn, pragmas):
+    cursor = dbapi_conn.cursor()
+    for name, value in pragmas.items():
+        cursor.execute(f'PRAGMA {name} = {value}')
+    cursor.close()
+
+def setup_sqlite(app):
+    """Gắn PRAGMA, BEGIN IMMEDIATE và engine read-only theo config vào engine của app.
+
+    Phải gọi trong app context, trước khi engine mở connection đầu tiên.
+    """
+    engine = db.engine
+    if engine.dialect.name != 'sqlite':
+        return
+    pragmas = app.config.get('SQLITE_PRAGMAS') or {}
+    immediate = app.config.get('SQLITE_IMMEDIATE_WRITES')
+
+    @event.listens_for(engine, 'connect')
+    def _on_connect(dbapi_conn, record):
+        if immediate:
+            # tự quản lý BEGIN thay cho pysqlite (xem _on_begin)
+            dbapi_conn.isolation_level = None
+        _apply_pragmas(dbapi_conn, pragmas)
+
+    if immediate:
+        @event.listens_for(engine, 'begin')
+        def _on_begin(conn):
+            writing = has_request_context() and request.method not in ('GET', 'HEAD')
+            conn.exec_driver_sql('BEGIN IMMEDIATE' if writing else 'BEGIN')
+
+    if app.config.get('SQLITE_READONLY_ENGINE') and engine.url.database not in (None, '', ':memory:'):
+        ro_pragmas = {k: v for k, v in pragmas.items() if k != 'journal_mode'}
+        ro_pragmas['query_only'] = 1
+        readonly = create_engine(
+            f'sqlite:///file:{engine.url.database}?mode=ro&uri=true',
+            **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}))
+
+        @event.listens_for(readonly, 'connect')
+        def _on_readonly_connect(dbapi_conn, record):
+            _apply_pragmas(dbapi_conn, ro_pragmas)
+
+        app.extensions['sqlite_readonly_engine'] = readonly
+
+# bảng nối post <-> tag; PK (post_id, tag_id) phục vụ tra tag của một post,
+# index (tag_id, post_id) phục vụ duyệt /tag/<name> theo thứ tự post mới nhất
+post_tag = db.Table(
+    'post_tag',
+    db.Column('post_id', db.Integer, db.ForeignKey('post.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('tag_id', db.Integer, db.ForeignKey('tag.id', ondelete='CASCADE'), primary_key=True),
+    db.Index('ix_post_tag_tag_post', 'tag_id', 'post_id'),
+)
+
+# INTEGER của SQLite là số 64-bit có dấu; int Python lớn hơn làm bind lỗi OverflowError
+SQLITE_INT_MIN, SQLITE_INT_MAX = -2 ** 63, 2 ** 63 - 1
+
+def sqlite_int(value):
+    """value nếu là int nằm trong phạm vi INTEGER của SQLite, ngược lại None."""
+    if isinstance(value, int) and not isinstance(value, bool) and SQLITE_INT_MIN <= value <= SQLITE_INT_MAX:
+        return value
+    return None
+
+def parse_tags(value):
+    """Tách chuỗi tag "a, B ,a" -> ['a', 'b'] (bỏ trùng, giữ thứ tự).
+
+    Tag được giữ "/" ở giữa ("ci/cd", route /tag/<path:name>) nhưng bỏ "/" ở
+    đầu/cuối: URL /tag//x bị Werkzeug gộp slash và không còn khớp tag.
+    """
+    names = []
+    for part in (value or '').split(','):
+        name = ' '.join(part.split()).strip('/ ').lower()[:100]
+        if name and name not in names:
+            names.append(name)
+    return names
+
+class Tag(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False, unique=True, index=True)
+
+def prune_tags():
+    """Xóa các tag không còn bài viết nào (gọi trước commit khi sửa/xóa bài). Trả về số tag đã xóa."""
+    db.session.flush()
+    used = db.select(post_tag.c.tag_id).where(post_tag.c.tag_id == Tag.id).exists()
+    return db.session.execute(
+        db.delete(Tag).where(~used).execution_options(synchronize_session=False)).rowcount
 
 class Post(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -9,7 +123,44 @@ class Post(db.Model):
     date = db.Column(db.String(50), default=datetime.utcnow)
     tags = db.Column(db.String(200), default="")
     desc = db.Column(db.Text, default="")
-    content = db.Column(db.Text, default="")
+    content = db.deferred(db.Column(db.Text, default=""))  # Markdown gốc, chỉ tải khi sửa/render
+
+    # kết quả render lúc lưu (content.render_markdown); post_detail chỉ đọc các cột này
+    content_html = db.deferred(db.Column(db.Text))
+    content_hash = db.Column(db.String(64))
+    content_toc = db.deferred(db.Column(db.Text))  # JSON [{level, id, name}]
+    excerpt = db.Column(db.Text, default="")
+    render_version = db.Column(db.Integer)
+
+    tag_list = db.relationship('Tag', secondary=post_tag, backref=db.backref('posts', lazy='dynamic'))
+
+    def sync_tags(self):
+        """Đồng bộ tag_list theo chuỗi tags (gọi khi lưu bài viết)."""
+        names = parse_tags(self.tags)
+        existing = {t.name: t for t in Tag.query.filter(Tag.name.in_(names))} if names else {}
+        self.tag_list = [existing.get(name) or Tag(name=name) for name in names]
+
+    def render_content(self, force=False):
+        """Render Markdown -> HTML nếu nội dung hoặc phiên bản renderer đã đổi.
+
+        Trả về True nếu có render lại.
+        """
+        if (not force and self.render_version == RENDERER_VERSION
+                and self.content_hash == content_hash(self.content)):
+            return False
+        self.apply_rendered(render_markdown(self.content))
+        return True
+
+    def apply_rendered(self, rendered):
+        self.content_html = rendered['html']
+        self.content_toc = json.dumps(rendered['toc'], ensure_ascii=False)
+        self.excerpt = rendered['excerpt']
+        self.content_hash = rendered['hash']
+        self.render_version = rendered['version']
+
+    @property
+    def toc(self):
+        return json.loads(self.content_toc or '[]')
 
 class Work(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -19,24 +170,52 @@ class Work(db.Model):
     desc = db.Column(db.Text, default="")
     image = db.Column(db.String(255), default="")
 
+    # ảnh thu nhỏ sinh từ `image` (images.py); image_source = giá trị image lúc sinh
+    image_source = db.Column(db.String(255))
+    image_variants = db.Column(db.Text)  # JSON {"webp": [[path, w, h], ...], "jpeg": [...]}
+    image_width = db.Column(db.Integer)  # kích thước bản nhỏ nhất, cho thuộc tính width/height
+    image_height = db.Column(db.Integer)
+
+    @property
+    def image_set(self):
+        """Các bản thu nhỏ nếu còn khớp với image hiện tại, ngược lại None."""
+        if not self.image_variants or self.image_source != self.image:
+            return None
+        return json.loads(self.image_variants)
+
 class Roadmap(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     description = db.Column(db.Text)
+    # bộ đếm task (denormalized), cập nhật cùng transaction với task
+    task_total = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    task_done = db.Column(db.Integer, nullable=False, default=0, server_default='0')
 
     # stages được xóa theo roadmap
     stages = db.relationship('Stage', backref='roadmap', cascade="all, delete-orphan", order_by="Stage.order")
 
 class Stage(db.Model):
+    __table_args__ = (
+        db.Index('ix_stage_roadmap_order', 'roadmap_id', 'order'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     roadmap_id = db.Column(db.Integer, db.ForeignKey('roadmap.id'), nullable=False)
     title = db.Column(db.String(200), nullable=False)
     description = db.Column(db.Text)
     order = db.Column(db.Integer, default=0)  # sắp xếp stage
+    task_total = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    task_done = db.Column(db.Integer, nullable=False, default=0, server_default='0')
 
     tasks = db.relationship('Task', backref='stage', cascade="all, delete-orphan", order_by="Task.id")
 
 class Task(db.Model):
+    __table_args__ = (
+        # (stage_id, is_done) phủ các phép đếm tiến độ; (stage_id, order) phục vụ danh sách đã sắp xếp
+        db.Index('ix_task_stage_done', 'stage_id', 'is_done'),
+        db.Index('ix_task_stage_order', 'stage_id', 'order'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     stage_id = db.Column(db.Integer, db.ForeignKey('stage.id'))
     title = db.Column(db.String(255))
@@ -44,3 +223,12 @@ class Task(db.Model):
     is_done = db.Column(db.Boolean, default=False)
     order = db.Column(db.Integer, default=0)  # ← thêm dòng này
 
+
+class ProgressEvent(db.Model):
+    """Thay đổi tiến độ task, đọc lại bởi stream SSE /roadmap/events của mọi worker."""
+    # AUTOINCREMENT: id không bị dùng lại sau khi dọn, Last-Event-ID luôn tăng
+    __table_args__ = {'sqlite_autoincrement': True}
+
+    id = db.Column(db.Integer, primary_key=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    payload = db.Column(db.Text, nullable=False)  # JSON {tasks, stage_progress, roadmap_progress}
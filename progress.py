@@ -0,0 +1,210 @@
+import json
+from models import db, Roadmap, Stage, Task, ProgressEvent
+
+
+def percent(done, total):
+    return int(done * 100 / total) if total else 0
+
+def progress_counts(roadmap_ids=None, stage_ids=None):
+    """Đếm (done, total) cho mọi stage và roadmap bằng một query GROUP BY.
+
+    Trả về hai dict: {stage_id: (done, total)} và {roadmap_id: (done, total)}.
+    Stage không có task vẫn xuất hiện với (0, 0) nhờ outer join.
+    """
+    q = (db.session.query(
+            Stage.roadmap_id,
+            Stage.id,
+            db.func.count(Task.id),
+            db.func.coalesce(db.func.sum(db.case((Task.is_done == True, 1), else_=0)), 0))
+         .outerjoin(Task, Task.stage_id == Stage.id)
+         .group_by(Stage.roadmap_id, Stage.id))
+    if roadmap_ids is not None:
+        q = q.filter(Stage.roadmap_id.in_(roadmap_ids))
+    if stage_ids is not None:
+        q = q.filter(Stage.id.in_(stage_ids))
+
+    stage_counts = {}
+    roadmap_counts = {}
+    for roadmap_id, stage_id, total, done in q:
+        stage_counts[stage_id] = (done, total)
+        r_done, r_total = roadmap_counts.get(roadmap_id, (0, 0))
+        roadmap_counts[roadmap_id] = (r_done + done, r_total + total)
+    return stage_counts, roadmap_counts
+
+
+# ---------------- Counters ----------------
+# Stage/Roadmap.task_total, task_done được cộng dồn bằng UPDATE ... SET x = x + n
+# trong cùng transaction với thay đổi của task, nên không có lost update giữa các worker.
+
+def _bump(model, row_id, total, done, *extra):
+    stmt = (db.update(model)
+            .where(model.id == row_id)
+            .values(task_total=model.task_total + total, task_done=model.task_done + done)
+            .returning(model.task_done, model.task_total, *extra)
+            .execution_options(synchronize_session=False))
+    return db.session.execute(stmt).first()
+
+def bump_roadmap_counters(roadmap_id, total=0, done=0):
+    """Cộng dồn bộ đếm của roadmap, trả về (done, total) mới."""
+    row = _bump(Roadmap, roadmap_id, total, done)
+    return (row[0], row[1]) if row else (0, 0)
+
+def bump_counters(stage_id, total=0, done=0):
+    """Cộng dồn bộ đếm của stage và roadmap chứa nó.
+
+    Trả về (roadmap_id, (stage_done, stage_total), (roadmap_done, roadmap_total)).
+    """
+    row = _bump(Stage, stage_id, total, done, Stage.roadmap_id)
+    if row is None:
+        return None, (0, 0), (0, 0)
+    stage_done, stage_total, roadmap_id = row
+    return roadmap_id, (stage_done, stage_total), bump_roadmap_counters(roadmap_id, total, done)
+
+def toggle_task(task_id):
+    """Đảo is_done của task và cập nhật bộ đếm, không cần đọc lại.
+
+    Trả về None nếu task không tồn tại, ngược lại dict giống response của
+    roadmap_task_toggle. Người gọi chịu trách nhiệm commit.
+    """
+    stmt = (db.update(Task)
+            .where(Task.id == task_id)
+            .values(is_done=db.case((Task.is_done == True, False), else_=True))
+            .returning(Task.is_done, Task.stage_id)
+            .execution_options(synchronize_session=False))
+    row = db.session.execute(stmt).first()
+    if row is None:
+        return None
+    is_done, stage_id = row
+    roadmap_id, stage_counts, roadmap_counts = bump_counters(stage_id, done=1 if is_done else -1)
+    result = {
+        'is_done': is_done,
+        'stage_progress': percent(*stage_counts),
+        'roadmap_progress': percent(*roadmap_counts),
+        'stage_id': stage_id,
+        'roadmap_id': roadmap_id,
+    }
+    record_event({task_id: is_done}, {stage_id: result['stage_progress']}, {roadmap_id: result['roadmap_progress']})
+    return result
+
+def rebuild_counters():
+    """Tính lại toàn bộ bộ đếm từ bảng task và ghi đè các dòng bị lệch.
+
+    Trả về list (kind, id, (done, total) cũ, (done, total) đúng) của các dòng đã sửa.
+    """
+    stage_counts, roadmap_counts = progress_counts()
+    drift = []
+    for model, kind, truth in ((Stage, 'stage', stage_counts), (Roadmap, 'roadmap', roadmap_counts)):
+        fixes = []
+        for row_id, done, total in db.session.query(model.id, model.task_done, model.task_total):
+            expected = truth.get(row_id, (0, 0))
+            if (done, total) != expected:
+                drift.append((kind, row_id, (done, total), expected))
+                fixes.append({'id': row_id, 'task_done': expected[0], 'task_total': expected[1]})
+        if fixes:
+            db.session.execute(db.update(model), fixes)
+    db.session.commit()
+    return drift
+
+
+# ---------------- Batch ----------------
+MAX_BATCH = 1000  # số id tối đa mỗi request (SQLite giới hạn số tham số bind)
+
+def set_tasks_done(task_ids, is_done=None, stage_id=None):
+    """Đặt is_done cho nhiều task bằng một UPDATE ... RETURNING.
+
+    is_done=None thì đảo trạng thái từng task. Chỉ các task thực sự đổi
+    trạng thái mới được cộng vào bộ đếm (một UPDATE cho mỗi stage/roadmap
+    bị ảnh hưởng). stage_id giới hạn trong một stage (admin). Trả về dict
+    tasks {id: is_done}, stage_progress {id: %}, roadmap_progress {id: %}.
+    Người gọi chịu trách nhiệm commit.
+    """
+    if is_done is None:
+        values = db.case((Task.is_done == True, False), else_=True)
+        where = [Task.id.in_(task_ids)]
+    else:
+        values = bool(is_done)
+        # task có is_done NULL được bộ đếm tính là chưa xong
+        where = [Task.id.in_(task_ids), Task.is_done.is_not(True) if is_done else Task.is_done == True]
+    if stage_id is not None:
+        where.append(Task.stage_id == stage_id)
+    stmt = (db.update(Task)
+            .where(*where)
+            .values(is_done=values)
+            .returning(Task.id, Task.is_done, Task.stage_id)
+            .execution_options(synchronize_session=False))
+    rows = db.session.execute(stmt).all()
+
+    stage_deltas = {}
+    for _, done, sid in rows:
+        # task không thuộc stage nào (stage_id NULL) không có bộ đếm để cộng
+        if sid is not None:
+            stage_deltas[sid] = stage_deltas.get(sid, 0) + (1 if done else -1)
+    stage_progress = {}
+    roadmap_deltas = {}
+    for sid, delta in stage_deltas.items():
+        row = _bump(Stage, sid, 0, delta, Stage.roadmap_id)
+        if row is None:
+            continue
+        done, total, roadmap_id = row
+        stage_progress[sid] = percent(done, total)
+        roadmap_deltas[roadmap_id] = roadmap_deltas.get(roadmap_id, 0) + delta
+    roadmap_progress = {rid: percent(*bump_roadmap_counters(rid, done=delta))
+                        for rid, delta in roadmap_deltas.items()}
+    tasks = {tid: done for tid, done, _ in rows}
+    if tasks:
+        record_event(tasks, stage_progress, roadmap_progress)
+    return {
+        'tasks': tasks,
+        'stage_progress': stage_progress,
+        'roadmap_progress': roadmap_progress,
+    }
+
+def delete_tasks(stage_id, task_ids):
+    """Xóa nhiều task của một stage bằng một DELETE, trừ bộ đếm một lần.
+
+    Trả về dict deleted, stage_progress, roadmap_progress như set_tasks_done.
+    """
+    total, done = (db.session.query(
+            db.func.count(Task.id),
+            db.func.coalesce(db.func.sum(db.case((Task.is_done == True, 1), else_=0)), 0))
+        .filter(Task.stage_id == stage_id, Task.id.in_(task_ids))
+        .one())
+    if total:
+        db.session.execute(
+            db.delete(Task).where(Task.stage_id == stage_id, Task.id.in_(task_ids))
+            .execution_options(synchronize_session=False))
+    roadmap_id, stage_counts, roadmap_counts = bump_counters(stage_id, total=-total, done=-done)
+    return {
+        'deleted': total,
+        'stage_progress': {stage_id: percent(*stage_counts)},
+        'roadmap_progress': {roadmap_id: percent(*roadmap_counts)},
+    }
+
+
+# ---------------- Events ----------------
+# Mỗi lần task đổi trạng thái ghi thêm một dòng progress_event trong cùng
+# transaction. Stream SSE của mọi worker đọc bảng này theo id tăng dần; SQLite
+# chỉ có một writer nên thứ tự id cũng là thứ tự commit.
+KEEP_EVENTS = 1000  # dọn mỗi 100 event; client lỡ nhiều hơn thế thì tải lại từ API
+
+def record_event(tasks, stage_progress, roadmap_progress):
+    """Ghi một event {tasks, stage_progress, roadmap_progress} và dọn event cũ. Trả về id."""
+    payload = json.dumps({'tasks': tasks, 'stage_progress': stage_progress, 'roadmap_progress': roadmap_progress})
+    event_id = db.session.execute(
+        db.insert(ProgressEvent).values(payload=payload).returning(ProgressEvent.id)).scalar()
+    if event_id % 100 == 0:
+        db.session.execute(
+            db.delete(ProgressEvent).where(ProgressEvent.id <= event_id - KEEP_EVENTS)
+            .execution_options(synchronize_session=False))
+    return event_id
+
+def latest_event_id():
+    return db.session.query(db.func.max(ProgressEvent.id)).scalar() or 0
+
+def events_since(last_id, limit=100):
+    """[(id, payload JSON)] của các event sau last_id, cũ trước."""
+    return (db.session.query(ProgressEvent.id, ProgressEvent.payload)
+            .filter(ProgressEvent.id > last_id)
+            .order_by(ProgressEvent.id)
+            .limit(limit)
+            .all())
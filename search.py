@@ -0,0 +1,157 @@
+import re
+from markupsafe import Markup, escape
+from sqlalchemy import event, text
+from models import db, Post
+
+# Bảng FTS5 riêng, rowid = post.id. Đồng bộ qua mapper event nên mọi
+# insert/update/delete Post qua ORM đều cập nhật index trong cùng transaction.
+FTS_DDL = """
+CREATE VIRTUAL TABLE IF NOT EXISTS post_fts USING fts5(
+    title, "desc", tags, content,
+    tokenize = 'unicode61 remove_diacritics 2'
+)
+"""
+FTS_DELETE = 'DELETE FROM post_fts WHERE rowid = :id'
+FTS_INSERT = ('INSERT INTO post_fts (rowid, title, "desc", tags, content) '
+              'SELECT id, title, "desc", tags, content FROM post WHERE id = :id')
+FTS_REBUILD = ('INSERT INTO post_fts (rowid, title, "desc", tags, content) '
+               'SELECT id, title, "desc", tags, content FROM post')
+
+# bm25: title > tags > desc > content. Snippet dùng ký tự điều khiển làm
+# marker để escape nội dung trước rồi mới thay bằng <mark>.
+_MARK_OPEN, _MARK_CLOSE = '\x02', '\x03'
+FTS_SEARCH = """
+SELECT post.id, post.title, post.date, post.tags,
+       snippet(post_fts, -1, char(2), char(3), '…', 24) AS snippet
+FROM post_fts JOIN post ON post.id = post_fts.rowid
+WHERE post_fts MATCH :q
+ORDER BY bm25(post_fts, 10.0, 4.0, 6.0, 1.0)
+LIMIT :limit OFFSET :offset
+"""
+# trang sâu hơn chỉ tốn công xếp hạng (và page lớn làm OFFSET tràn số); coi như hết kết quả
+MAX_PAGE = 1000
+
+
+def create_index(conn=None):
+    """Tạo bảng FTS nếu chưa có. Trả về True nếu vừa tạo mới."""
+    conn = conn or db.session.connection()
+    exists = conn.execute(text(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'post_fts'")).first()
+    if exists:
+        return False
+    conn.execute(text(FTS_DDL))
+    return True
+
+def rebuild_index(conn=None):
+    """Xóa và đánh index lại toàn bộ bài viết. Trả về số bài đã index."""
+    conn = conn or db.session.connection()
+    create_index(conn)
+    conn.execute(text('DELETE FROM post_fts'))
+    conn.execute(text(FTS_REBUILD))
+    return conn.execute(text('SELECT count(*) FROM post_fts')).scalar()
+
+
+@event.listens_for(Post, 'after_insert')
+@event.listens_for(Post, 'after_update')
+def _index_post(mapper, connection, target):
+    # đọc lại từ bảng post thay vì target: Post.content là deferred, có thể chưa được load
+    connection.execute(text(FTS_DELETE), {'id': target.id})
+    connection.execute(text(FTS_INSERT), {'id': target.id})
+
+@event.listens_for(Post, 'after_delete')
+def _unindex_post(mapper, connection, target):
+    connection.execute(text(FTS_DELETE), {'id': target.id})
+
+
+def build_match(q):
+    """Chuyển input người dùng thành cú pháp MATCH an toàn.
+
+    Mỗi từ được quote (tránh lỗi cú pháp FTS5 với ký tự đặc biệt), các từ
+    AND với nhau, từ cuối cùng khớp theo tiền tố.
+    """
+    terms = re.findall(r'\w+', q or '')
+    if not terms:
+        return None
+    quoted = ['"%s"' % t for t in terms]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+def _highlight(snippet):
+    return Markup(str(escape(snippet or ''))
+                  .replace(_MARK_OPEN, '<mark>')
+                  .replace(_MARK_CLOSE, '</mark>'))
+
+def search_posts(q, page=1, per_page=10, conn=None):
+    """Tìm bài viết, trả về (results, has_next). results là list dict đã có snippet HTML."""
+    match = build_match(q)
+    if match is None or page > MAX_PAGE:
+        return [], False
+    conn = conn or db.session.connection()
+    rows = conn.execute(text(FTS_SEARCH), {
+        'q': match,
+        'limit': per_page + 1,
+        'offset': (page - 1) * per_page,
+    }).all()
+    results = [{
+        'id': r.id,
+        'title': r.title,
+        'date': r.date,
+        'tags': r.tags,
+        'snippet': _highlight(r.snippet),
+    } for r in rows[:per_page]]
+    return results, len(rows) > per_page and page < MAX_PAGE
+
+
+# ---------------- Benchmark ----------------
+_SYLLABLES = ('an ba ca de fi go hu ki lo mu na pe qua ri so tu vi xa yo '
+              'ngu tha chi phu tro khe nhi gia').split()
+
+def benchmark(n_posts=50000, n_queries=200, vocab_size=20000, seed=0):
+    """Đo latency của search_posts trên một DB SQLite tạm với n_posts bài sinh ngẫu nhiên.
+
+    Từ vựng phân phối theo Zipf (vài từ rất phổ biến, đa số hiếm) để gần
+    với văn bản thật. Trả về dict thời gian (ms): index, p50, p95, p99.
+    """
+    import itertools
+    import os
+    import random
+    import statistics
+    import tempfile
+    import time
+    from sqlalchemy import create_engine
+
+    rnd = random.Random(seed)
+    vocab = [''.join(p) for n in (2, 3) for p in itertools.product(_SYLLABLES, repeat=n)]
+    rnd.shuffle(vocab)
+    vocab = vocab[:vocab_size]
+    weights = list(itertools.accumulate(1.0 / rank for rank in range(1, len(vocab) + 1)))
+    def words(n):
+        return ' '.join(rnd.choices(vocab, cum_weights=weights, k=n))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine('sqlite:///' + os.path.join(tmp, 'bench.db'))
+        with engine.begin() as conn:
+            conn.execute(text('CREATE TABLE post (id INTEGER PRIMARY KEY, title TEXT, date TEXT, '
+                              'tags TEXT, "desc" TEXT, content TEXT)'))
+            conn.execute(
+                text('INSERT INTO post (id, title, date, tags, "desc", content) '
+                     'VALUES (:id, :title, :date, :tags, :desc, :content)'),
+                [{'id': i, 'title': words(6), 'date': '2025-01-01', 'tags': words(3),
+                  'desc': words(30), 'content': words(rnd.randint(300, 1500))}
+                 for i in range(1, n_posts + 1)])
+            started = time.perf_counter()
+            rebuild_index(conn)
+            index_ms = (time.perf_counter() - started) * 1000
+
+        timings = []
+        with engine.connect() as conn:
+            for _ in range(n_queries):
+                q = words(rnd.randint(1, 3))
+                started = time.perf_counter()
+                search_posts(q, page=rnd.randint(1, 3), conn=conn)
+                timings.append((time.perf_counter() - started) * 1000)
+        engine.dispose()
+
+    cuts = statistics.quantiles(timings, n=100)
+    return {'posts': n_posts, 'queries': n_queries, 'index_ms': round(index_ms, 1),
+            'p50_ms': round(cuts[49], 2), 'p95_ms': round(cuts[94], 2), 'p99_ms': round(cuts[98], 2)}
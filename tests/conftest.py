@@ -0,0 +1,28 @@
+import os
+import sys
+import tempfile
+
+# config.py đọc biến môi trường lúc import: đặt DB tạm trước khi import app
+_tmp = tempfile.mkdtemp(prefix='blog-test-')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(_tmp, 'blog.db')
+os.environ['PAGE_CACHE_ENABLED'] = '0'
+os.environ.setdefault('APP_CONFIG', 'development')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+
+@pytest.fixture(scope='session')
+def app():
+    from app import create_app
+    return create_app()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+@pytest.fixture
+def admin(client):
+    with client.session_transaction() as s:
+        s['admin'] = True
+    return client
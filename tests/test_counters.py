@@ -0,0 +1,65 @@
+"""task_done/task_total lưu sẵn trên Stage/Roadmap phải luôn khớp progress_counts()."""
+import pytest
+from bench.seed import seed
+from models import db, Roadmap, Stage, Task
+from progress import rebuild_counters
+
+
+@pytest.fixture
+def tree(app):
+    """Roadmap mới có 3 stage x 4 task; trả về (roadmap_id, [stage_id], {stage_id: [task_id]})."""
+    with app.app_context():
+        seed(posts=0, works=0, roadmaps=1, stages=3, tasks=4, random_seed=7)
+        rid = db.session.query(db.func.max(Roadmap.id)).scalar()
+        stages = [sid for (sid,) in db.session.query(Stage.id).filter_by(roadmap_id=rid).order_by(Stage.id)]
+        tasks = {sid: [tid for (tid,) in db.session.query(Task.id).filter_by(stage_id=sid).order_by(Task.id)]
+                 for sid in stages}
+        assert rebuild_counters() == []
+        db.session.remove()
+    return rid, stages, tasks
+
+def assert_no_drift(app):
+    with app.app_context():
+        assert rebuild_counters() == []
+
+def test_counters_follow_every_task_route(app, admin, tree):
+    rid, (s1, s2, s3), tasks = tree
+    steps = [
+        ('post', f'/admin/stages/{s1}/tasks/new', {'data': {'title': 'mới', 'is_done': 'on'}}),
+        ('post', f'/admin/stages/{s1}/tasks/new', {'data': {'title': 'mới 2'}}),
+        ('post', f'/admin/tasks/{tasks[s1][0]}/edit', {'data': {'title': 'sửa', 'is_done': 'on'}}),
+        ('post', f'/admin/tasks/{tasks[s1][0]}/edit', {'data': {'title': 'sửa'}}),
+        ('post', f'/admin/tasks/{tasks[s1][1]}/delete', {}),
+        ('post', f'/roadmap/task/{tasks[s2][0]}/toggle', {}),
+        ('post', f'/roadmap/task/{tasks[s2][0]}/toggle', {}),
+        # nhiều stage trong một lần, có id trùng
+        ('post', '/roadmap/tasks/toggle', {'json': {'ids': [tasks[s2][1], tasks[s3][0], tasks[s2][1]]}}),
+        ('post', '/roadmap/tasks/toggle', {'json': {'ids': tasks[s2] + tasks[s3], 'is_done': True}}),
+        ('post', '/roadmap/tasks/toggle', {'json': {'ids': [tasks[s3][1]], 'is_done': False}}),
+        # id của stage khác trong bulk phải bị bỏ qua, không làm lệch bộ đếm
+        ('post', f'/admin/stages/{s2}/tasks/bulk', {'json': {'ids': tasks[s2] + tasks[s3][:1], 'action': 'undone'}}),
+        ('post', f'/admin/stages/{s2}/tasks/bulk', {'data': {'ids': [str(tasks[s2][0]), str(tasks[s3][2])],
+                                                             'action': 'done'}}),
+        ('post', f'/admin/stages/{s3}/tasks/bulk', {'json': {'ids': tasks[s3][:2] + tasks[s2][-1:], 'action': 'delete'}}),
+        ('post', f'/admin/stages/{s2}/delete', {}),
+    ]
+    for method, path, kwargs in steps:
+        response = getattr(admin, method)(path, **kwargs)
+        assert response.status_code in (200, 302), (path, response.status_code)
+        assert_no_drift(app)
+
+    with app.app_context():
+        stage = db.session.get(Stage, s1)
+        roadmap = db.session.get(Roadmap, rid)
+        assert (stage.task_done, stage.task_total) != (0, 0)
+        assert roadmap.task_total == stage.task_total + db.session.get(Stage, s3).task_total
+
+def test_toggle_task_without_stage(app, client):
+    with app.app_context():
+        task = Task(title='mồ côi', stage_id=None, is_done=False)
+        db.session.add(task)
+        db.session.commit()
+        tid = task.id
+    assert client.post(f'/roadmap/task/{tid}/toggle').status_code in (200, 404)
+    assert client.post('/roadmap/tasks/toggle', json={'ids': [tid], 'is_done': True}).status_code == 200
+    assert_no_drift(app)
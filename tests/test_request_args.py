@@ -0,0 +1,33 @@
+"""Tham số request sai hoặc quá lớn phải bị bỏ qua / trả 4xx, không bao giờ 500."""
+import pytest
+
+HUGE = 10 ** 20
+
+
+@pytest.fixture(scope='module', autouse=True)
+def tagged_post(app):
+    client = app.test_client()
+    with client.session_transaction() as s:
+        s['admin'] = True
+    client.post('/admin/posts/new', data={'title': 'Bài có tag', 'tags': 'python', 'content': 'a'})
+
+
+@pytest.mark.parametrize('path', ['/blog', '/works', '/tag/python', '/admin/posts', '/admin/works'])
+@pytest.mark.parametrize('arg', ['before', 'after'])
+def test_keyset_cursor_out_of_range(admin, path, arg):
+    for value in (HUGE, -HUGE):
+        assert admin.get(f'{path}?{arg}={value}').status_code == 200
+
+@pytest.mark.parametrize('page', [HUGE, 1001, -HUGE])
+def test_search_page_out_of_range(client, page):
+    assert client.get(f'/search?q=a&page={page}').status_code == 200
+
+@pytest.mark.parametrize('ids', [[1.5], [True], [HUGE], ['1.5'], ['-1'], [-1], [None], '1'])
+def test_toggle_rejects_non_ids(client, ids):
+    r = client.post('/roadmap/tasks/toggle', json={'ids': ids})
+    assert r.status_code == 400
+
+def test_parse_ids_accepts_ints_and_digit_strings(app):
+    from app import parse_ids
+    assert parse_ids([3, '1', 3, '02']) == [3, 1, 2]
+    assert parse_ids([2 ** 63]) is None
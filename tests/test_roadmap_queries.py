@@ -0,0 +1,51 @@
+"""Số query của trang roadmap không được tăng theo số roadmap/stage/task (không N+1)."""
+from contextlib import contextmanager
+from sqlalchemy import event
+from bench.seed import seed
+from models import db, Roadmap
+
+
+@contextmanager
+def count_queries(app):
+    engines = [db.engine, app.extensions.get('sqlite_readonly_engine')]
+    engines = [e for e in engines if e is not None]
+    statements = []
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    for engine in engines:
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        for engine in engines:
+            event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+def query_counts(app):
+    client = app.test_client()
+    with app.app_context():
+        largest = db.session.query(Roadmap.id).order_by(Roadmap.task_total.desc(), Roadmap.id).first().id
+        db.session.remove()
+    counts = {}
+    for name, path in (('list', '/roadmap'), ('detail', f'/api/roadmaps/{largest}')):
+        client.get(path)  # lượt đầu: bỏ qua query chỉ chạy một lần
+        with app.app_context(), count_queries(app) as statements:
+            assert client.get(path).status_code == 200
+        counts[name] = len(statements)
+    return counts
+
+def test_roadmap_query_count_is_constant(app):
+    with app.app_context():
+        seed(posts=0, works=0, roadmaps=2, stages=2, tasks=2)
+    small = query_counts(app)
+    with app.app_context():
+        seed(posts=0, works=0, roadmaps=20, stages=8, tasks=25, random_seed=1)
+    large = query_counts(app)
+    assert small == large, (small, large)
+
+def test_hot_queries_run(app):
+    # flask db-explain: mọi query trong HOT_QUERIES phải chạy được trên schema hiện tại
+    from migrations import HOT_QUERIES, explain_hot_queries
+    with app.app_context():
+        report = explain_hot_queries(repeat=1)
+    assert [name for name, plan, ms in report] == list(HOT_QUERIES)
+    assert all(plan for name, plan, ms in report)
@@ -0,0 +1,15 @@
+"""Mọi link tag sinh ra trên trang phải mở được (tag có "/" như ci/cd)."""
+import re
+from models import db, Post
+
+
+def test_tag_links_resolve(app, admin):
+    admin.post('/admin/posts/new', data={'title': 'Tag có slash', 'tags': 'CI/CD, /lead, trail/', 'content': 'x'})
+    with app.app_context():
+        post_id = db.session.query(db.func.max(Post.id)).scalar()
+    links = set()
+    for path in ('/', '/blog', f'/post/{post_id}', '/tags'):
+        links.update(re.findall(r'href="(/tag/[^"]+)"', admin.get(path).get_data(as_text=True)))
+    assert {'/tag/ci/cd', '/tag/lead', '/tag/trail'} <= links
+    for link in links:
+        assert admin.get(link).status_code == 200, link
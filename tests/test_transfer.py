@@ -0,0 +1,19 @@
+"""import-jsonl báo lỗi rõ ràng (kèm số dòng) thay vì traceback."""
+import pytest
+
+
+@pytest.mark.parametrize('line', ['[1, 2]', '"post"', '{"type": "roadmap", "title": "r", "stages": [1]}',
+                                  '{"type": "roadmap", "title": "r", "stages": [{"tasks": "x"}]}'])
+def test_import_rejects_non_object_records(app, line):
+    result = app.test_cli_runner().invoke(args=['import-jsonl', '-'], input='{"type": "work", "title": "w"}\n' + line)
+    assert result.exit_code == 1
+    assert 'dòng 2' in result.output
+
+def test_import_upsert_hint_only_for_id_conflict(app):
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=['import-jsonl', '-'], input='{"type": "post", "id": 900001}\n')
+    assert 'NOT NULL' in result.output and '--upsert' not in result.output
+    line = '{"type": "post", "id": 900001, "title": "a"}\n'
+    assert runner.invoke(args=['import-jsonl', '-'], input=line).exit_code == 0
+    result = runner.invoke(args=['import-jsonl', '-'], input=line)
+    assert 'UNIQUE' in result.output and '--upsert' in result.output
@@ -0,0 +1,207 @@
+"""Xuất/nhập nội dung dạng JSONL (flask export-jsonl / import-jsonl).
+
+Mỗi dòng là một bản ghi {"type": "post" | "work" | "roadmap", ...}; roadmap
+chứa luôn "stages", mỗi stage chứa "tasks". Chỉ cột gốc được xuất; dữ liệu
+dẫn xuất (HTML đã render, FTS, tag, bộ đếm task, ảnh thu nhỏ) được tính
+lại khi nhập. Cả hai chiều đều stream theo chunk nên bộ nhớ không phụ
+thuộc kích thước file.
+"""
+import json
+import time
+from datetime import datetime
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from models import db, Post, Work, Roadmap, Stage, Task, Tag, post_tag, parse_tags, prune_tags
+from migrations import render_posts
+from progress import rebuild_counters
+import search
+
+POST_COLUMNS = ('id', 'title', 'date', 'tags', 'desc', 'content')
+WORK_COLUMNS = ('id', 'title', 'year', 'category', 'desc', 'image')
+ROADMAP_COLUMNS = ('id', 'title', 'description')
+STAGE_COLUMNS = ('id', 'title', 'description', 'order')
+TASK_COLUMNS = ('id', 'title', 'description', 'is_done', 'order')
+TYPES = ('post', 'work', 'roadmap')
+
+
+# ---------------- Export ----------------
+def _stream(model, columns, chunk_size, *where):
+    stmt = (db.select(*(getattr(model, c) for c in columns)).where(*where).order_by(model.id)
+            .execution_options(yield_per=chunk_size))
+    for row in db.session.execute(stmt):
+        yield dict(zip(columns, row))
+
+def _roadmap_trees(chunk_size):
+    """Roadmap kèm stages/tasks, 3 query cho mỗi lô roadmap (không N+1)."""
+    batch = []
+    def flush():
+        ids = [r['id'] for r in batch]
+        stages = {}
+        for s in _stream(Stage, ('roadmap_id',) + STAGE_COLUMNS, chunk_size, Stage.roadmap_id.in_(ids)):
+            stages.setdefault(s.pop('roadmap_id'), []).append(s)
+        by_id = {s['id']: s for group in stages.values() for s in group}
+        for s in by_id.values():
+            s['tasks'] = []
+        if by_id:
+            for t in _stream(Task, ('stage_id',) + TASK_COLUMNS, chunk_size, Task.stage_id.in_(list(by_id))):
+                by_id[t.pop('stage_id')]['tasks'].append(t)
+        for r in batch:
+            for s in stages.get(r['id'], []):
+                s['tasks'].sort(key=lambda t: (t['order'] or 0, t['id']))
+            r['stages'] = sorted(stages.get(r['id'], []), key=lambda s: (s['order'] or 0, s['id']))
+            yield r
+
+    for roadmap in _stream(Roadmap, ROADMAP_COLUMNS, chunk_size):
+        batch.append(roadmap)
+        if len(batch) >= 200:
+            yield from flush()
+            batch = []
+    if batch:
+        yield from flush()
+
+def export_jsonl(out, types=TYPES, chunk_size=1000):
+    """Ghi các bản ghi JSONL vào file object out. Trả về {type: số bản ghi}."""
+    sources = {
+        'post': lambda: _stream(Post, POST_COLUMNS, chunk_size),
+        'work': lambda: _stream(Work, WORK_COLUMNS, chunk_size),
+        'roadmap': lambda: _roadmap_trees(chunk_size),
+    }
+    counts = {}
+    for kind in types:
+        counts[kind] = 0
+        for record in sources[kind]():
+            out.write(json.dumps({'type': kind, **record}, ensure_ascii=False) + '\n')
+            counts[kind] += 1
+    return counts
+
+
+# ---------------- Import ----------------
+def _row(record, columns, defaults):
+    # executemany cần mọi dict cùng key; thiếu id -> NULL -> SQLite tự cấp
+    return {c: record.get(c, defaults.get(c)) for c in columns}
+
+def _insert(model, rows, upsert, extra_set=None):
+    """INSERT (hoặc upsert theo id) nhiều dòng trong một executemany, trả về id theo đúng thứ tự rows."""
+    table = model.__table__
+    stmt = sqlite_insert(table)
+    if upsert:
+        update = {c: stmt.excluded[c] for c in rows[0] if c != 'id'}
+        update.update(extra_set(table, stmt) if extra_set else {})
+        stmt = stmt.on_conflict_do_update(index_elements=['id'], set_=update)
+    result = db.session.execute(stmt.returning(table.c.id, sort_by_parameter_order=True), rows)
+    return [row_id for (row_id,) in result]
+
+def _post_rendered_on_change(table, stmt):
+    # nội dung đổi -> render_version NULL để render_posts render lại
+    return {'render_version': db.case((table.c.content != stmt.excluded.content, None),
+                                      else_=table.c.render_version)}
+
+def _sync_post_derived(ids, rows, upsert):
+    """FTS và post_tag cho một chunk bài viết vừa ghi bằng Core (không qua mapper event)."""
+    # một câu cho cả chunk; FTS_DELETE/FTS_INSERT từng dòng chậm hơn nhiều
+    id_list = db.bindparam('ids', expanding=True)
+    if upsert:
+        db.session.execute(db.text('DELETE FROM post_fts WHERE rowid IN :ids').bindparams(id_list), {'ids': ids})
+    db.session.execute(db.text(search.FTS_REBUILD + ' WHERE id IN :ids').bindparams(id_list), {'ids': ids})
+
+    names_by_post = {i: parse_tags(r['tags']) for i, r in zip(ids, rows)}
+    names = sorted({n for group in names_by_post.values() for n in group})
+    if names:
+        db.session.execute(sqlite_insert(Tag.__table__).on_conflict_do_nothing(index_elements=['name']),
+                           [{'name': n} for n in names])
+    tag_ids = dict(db.session.execute(db.select(Tag.name, Tag.id).where(Tag.name.in_(names))).all())
+    db.session.execute(db.delete(post_tag).where(post_tag.c.post_id.in_(ids)))
+    pairs = [{'post_id': i, 'tag_id': tag_ids[n]} for i, group in names_by_post.items() for n in group]
+    if pairs:
+        db.session.execute(db.insert(post_tag), pairs)
+    if upsert:
+        prune_tags()
+
+def _is_object_list(items, child=None):
+    """items là list các dict (và items[i][child], nếu có, cũng vậy)."""
+    return isinstance(items, list) and all(
+        isinstance(item, dict) and (child is None or _is_object_list(item.get(child, [])))
+        for item in items)
+
+class _Importer:
+    def __init__(self, upsert, chunk_size):
+        self.upsert = upsert
+        self.chunk_size = chunk_size
+        self.now = str(datetime.utcnow())
+        self.pending = {kind: [] for kind in TYPES}
+        self.pending_rows = 0
+        self.counts = {'post': 0, 'work': 0, 'roadmap': 0, 'stage': 0, 'task': 0}
+
+    def add(self, record):
+        if not isinstance(record, dict):
+            raise ValueError(f'bản ghi phải là object JSON, nhận {type(record).__name__}')
+        kind = record.get('type')
+        if kind not in self.pending:
+            raise ValueError(f'type không hợp lệ: {kind!r}')
+        if not _is_object_list(record.get('stages', []), 'tasks'):
+            raise ValueError('stages phải là list object, tasks của mỗi stage cũng vậy')
+        self.pending[kind].append(record)
+        self.pending_rows += 1 + sum(1 + len(s.get('tasks', [])) for s in record.get('stages', []))
+        if self.pending_rows >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        posts, works, roadmaps = (self.pending[k] for k in TYPES)
+        if posts:
+            rows = [_row(p, POST_COLUMNS, {'date': self.now, 'tags': '', 'desc': '', 'content': ''}) for p in posts]
+            ids = _insert(Post, rows, self.upsert, _post_rendered_on_change)
+            _sync_post_derived(ids, rows, self.upsert)
+            self.counts['post'] += len(rows)
+        if works:
+            rows = [_row(w, WORK_COLUMNS, {'year': '', 'category': '', 'desc': '', 'image': ''}) for w in works]
+            _insert(Work, rows, self.upsert)
+            self.counts['work'] += len(rows)
+        if roadmaps:
+            self._flush_roadmaps(roadmaps)
+        db.session.commit()
+        self.pending = {kind: [] for kind in TYPES}
+        self.pending_rows = 0
+
+    def _flush_roadmaps(self, roadmaps):
+        roadmap_ids = _insert(Roadmap, [_row(r, ROADMAP_COLUMNS, {}) for r in roadmaps], self.upsert)
+        stages = [(rid, s) for rid, r in zip(roadmap_ids, roadmaps) for s in r.get('stages', [])]
+        self.counts['roadmap'] += len(roadmaps)
+        if not stages:
+            return
+        stage_rows = [{**_row(s, STAGE_COLUMNS, {'order': n}), 'roadmap_id': rid}
+                      for n, (rid, s) in enumerate(stages, start=1)]
+        stage_ids = _insert(Stage, stage_rows, self.upsert)
+        task_rows = [{**_row(t, TASK_COLUMNS, {'is_done': False, 'order': n}), 'stage_id': sid}
+                     for sid, (_, s) in zip(stage_ids, stages) for n, t in enumerate(s.get('tasks', []), start=1)]
+        if task_rows:
+            _insert(Task, task_rows, self.upsert)
+        self.counts['stage'] += len(stage_rows)
+        self.counts['task'] += len(task_rows)
+
+def import_jsonl(lines, upsert=False, chunk_size=1000, workers=None):
+    """Nhập bản ghi từ một iterable các dòng JSONL (cần app context).
+
+    Mỗi chunk ghi trong một transaction. Sau cùng render Markdown của các bài
+    mới/đổi nội dung và tính lại bộ đếm task. Trả về dict số dòng theo loại,
+    rendered, seconds và rows_per_s.
+    """
+    started = time.perf_counter()
+    importer = _Importer(upsert, chunk_size)
+    try:
+        for number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                importer.add(json.loads(line))
+            except ValueError as e:
+                raise ValueError(f'dòng {number}: {e}') from e
+        importer.flush()
+    except Exception:
+        db.session.rollback()
+        raise
+    rendered = render_posts(workers=workers)
+    rebuild_counters()
+
+    seconds = time.perf_counter() - started
+    total = sum(importer.counts.values())
+    return dict(importer.counts, rendered=rendered, seconds=round(seconds, 2),
+                rows_per_s=round(total / seconds) if seconds else total)